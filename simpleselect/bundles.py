@@ -0,0 +1,60 @@
+"""Bundles of all choices of small fields, searched in the browser.
+
+A field with ``bundle_max_rows`` set, whose ``data`` has at most that many
+rows, is rendered with the URL of a bundle of all of its ``(pk, label)``
+pairs. The browser fetches it once and filters it locally, so searching the
+field never makes another request.
+
+Bundle URLs carry the field's data version, so a bundle can be cached for as
+long as the browser likes: when the data changes, pages get a new URL.
+
+"""
+from . import cache
+from . import labels
+
+
+def get_version(field):
+    """Get the version of a field's data, as used in bundle URLs."""
+    return '.'.join(str(version) for version in
+                    cache.get_versions(cache.get_field_models(field)))
+
+
+def get_bundle_version(field):
+    """Get the version of a field's bundle, or ``None`` if the field isn't
+    bundled.
+
+    The number of rows is counted once per data version and remembered in
+    the cache.
+
+    """
+    if field.bundle_max_rows is None:
+        return None
+    version = get_version(field)
+    key = 'simpleselect:bundle-size:{}:{}'.format(field.registry_key_func(),
+                                                  version)
+    size = cache.get_or_set(key, field.data.count, None)
+    if size > field.bundle_max_rows:
+        return None
+    return version
+
+
+def get_bundle_key(field, version):
+    """Get the cache key of a field's bundle."""
+    return 'simpleselect:bundle:{}:{}'.format(field.registry_key_func(),
+                                              version)
+
+
+def make_bundle(field, qset):
+    """Get the primary key and label of every object in ``qset``.
+
+    :rtype: list
+    :returns: ``[pk, label]`` pairs, which take less room in JSON than
+              objects.
+
+    """
+    if not qset.ordered:
+        qset = qset.order_by('pk')
+    objects = labels.prepare_queryset(qset, field.label_format,
+                                      field.label_related)
+    return [[labels.get_pk(obj), labels.make_label(obj, field.label_format)]
+            for obj in objects]
@@ -0,0 +1,303 @@
+"""Server-side caching of autocomplete results.
+
+Cached results are never deleted outright. Instead every model that feeds a
+field has a *data version*, which is part of every cache key and gets bumped
+whenever an instance of that model is saved or deleted, so stale entries just
+stop being looked up and age out of the cache on their own.
+
+The data version is a millisecond timestamp rather than a plain counter, so if
+the cache loses it a freshly made one can't collide with an older one.
+
+"""
+import collections
+import hashlib
+import logging
+import threading
+import time
+
+import django.conf
+import django.core.cache
+import django.db.models.signals
+from django.core.cache.backends.base import BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+try:
+    from django.core.cache.backends.base import DEFAULT_TIMEOUT
+except ImportError:  # Django < 1.6
+    DEFAULT_TIMEOUT = None
+
+#: The timeout of entries which should never expire, like data versions.
+#: Before Django 1.6 a timeout of ``None`` means the cache's default one, so
+#: there it's ten years instead.
+if DEFAULT_TIMEOUT is None:
+    FOREVER = 10 * 365 * 24 * 60 * 60
+else:
+    FOREVER = None
+
+logger = logging.getLogger(__name__)
+
+
+def get_cache(alias=None):
+    """Get the Django cache used by simpleselect.
+
+    This is the cache alias named by the ``SIMPLESELECT_CACHE`` setting, or
+    ``'default'``.
+
+    """
+    if alias is None:
+        alias = getattr(django.conf.settings, 'SIMPLESELECT_CACHE', 'default')
+    try:
+        return django.core.cache.caches[alias]
+    except AttributeError:  # Django < 1.7
+        return django.core.cache.get_cache(alias)
+
+
+#: Cache aliases already warned about by :py:func:`get_version_cache`.
+WARNED_ALIASES = set()
+
+
+def get_version_cache():
+    """Get the cache holding data versions.
+
+    That's the cache alias named by the ``SIMPLESELECT_VERSION_CACHE``
+    setting, or else the one of :py:func:`get_cache`. Every process has to
+    see the same versions, or the others never notice a save and keep
+    serving stale results, so a warning is logged (once) if it's a cache
+    local to the process.
+
+    """
+    alias = getattr(django.conf.settings, 'SIMPLESELECT_VERSION_CACHE', None)
+    cache = get_cache(alias)
+    if isinstance(cache, (LocMemCache, LRUCache)) and \
+            alias not in WARNED_ALIASES:
+        WARNED_ALIASES.add(alias)
+        logger.warning(
+            "simpleselect keeps data versions in a cache local to each "
+            "process (%s), so saves in one process go unnoticed in the "
+            "others. Set SIMPLESELECT_VERSION_CACHE (or SIMPLESELECT_CACHE) "
+            "to a shared cache such as memcached.", type(cache).__name__)
+    return cache
+
+
+def get_version_key(model):
+    """Get the cache key holding the data version of ``model``."""
+    opts = model._meta
+    return 'simpleselect:version:{}.{}'.format(opts.app_label,
+                                               opts.object_name)
+
+
+def now_ms():
+    """Get the current time in whole milliseconds."""
+    return int(time.time() * 1000)
+
+
+def get_versions(models, cache=None):
+    """Get the data versions of several models at once.
+
+    Models without a stored version get one now, and from now on their
+    versions are bumped by this process too (see :py:func:`watch`).
+
+    :rtype: list of int
+
+    """
+    for model in models:
+        watch(model)
+    if cache is None:
+        cache = get_version_cache()
+    keys = [get_version_key(m) for m in models]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, now_ms(), FOREVER)
+            found[key] = cache.get(key, now_ms())
+        versions.append(found[key])
+    return versions
+
+
+def bump_version(model, cache=None):
+    """Give ``model`` a new data version, invalidating cached results."""
+    if cache is None:
+        cache = get_version_cache()
+    key = get_version_key(model)
+    old = cache.get(key, 0)
+    cache.set(key, max(now_ms(), old + 1), FOREVER)
+
+
+def invalidate(sender, **kwargs):
+    """Signal receiver that bumps the data version of the sending model."""
+    bump_version(sender)
+
+
+#: Models whose saves and deletes bump their data version.
+WATCHED = set()
+
+
+def watch(model):
+    """Bump ``model``'s data version whenever one is saved or deleted.
+
+    Calling this more than once for the same model has no further effect.
+
+    """
+    if model in WATCHED:
+        return
+    WATCHED.add(model)
+    for signal in (django.db.models.signals.post_save,
+                   django.db.models.signals.post_delete):
+        signal.connect(invalidate, sender=model,
+                       dispatch_uid='simpleselect.cache.invalidate')
+
+
+def get_field_models(field):
+    """Get every model whose changes should invalidate ``field``'s results.
+
+    That is the model of ``field.data`` plus ``field.cache_dependencies``.
+
+    """
+    return [field.data.model] + list(field.cache_dependencies)
+
+
+def get_search_key(field, terms, offset):
+    """Get the cache key for one page of search results.
+
+    :param field: The AutoSelectField subclass being searched.
+
+    :type  terms: seq of str
+    :param terms: The search terms. Their order doesn't change the results so
+                  it doesn't change the key either.
+
+    :type  offset: int
+    :param offset: The number of results skipped.
+
+    """
+    versions = get_versions(get_field_models(field))
+    digest = hashlib.sha1('\0'.join(sorted(set(terms))).encode('utf-8'))
+    return 'simpleselect:search:{}:{}:{}:{}'.format(
+        field.registry_key_func(), '.'.join(str(v) for v in versions),
+        offset, digest.hexdigest())
+
+
+def get_or_set(key, producer, timeout, cache=None):
+    """Get a value from the cache, or compute and store it.
+
+    :type  producer: callable
+    :param producer: Called without arguments if ``key`` isn't cached; its
+                     return value is cached and returned.
+
+    """
+    if cache is None:
+        cache = get_cache()
+    value = cache.get(key)
+    if value is None:
+        value = producer()
+        cache.set(key, value, timeout)
+    return value
+
+
+class LRUCache(BaseCache):
+    """An in-process cache backend which evicts the least recently used keys.
+
+    Django's ``LocMemCache`` culls a fraction of entries in arbitrary order
+    once it is full, which tends to throw away the hottest searches. This
+    backend keeps the ``MAX_ENTRIES`` most recently read or written keys.
+    Use it like any other backend::
+
+        CACHES = {
+            'simpleselect': {
+                'BACKEND': 'simpleselect.cache.LRUCache',
+                'OPTIONS': {'MAX_ENTRIES': 10000},
+            },
+        }
+        SIMPLESELECT_CACHE = 'simpleselect'
+
+    Entries are kept per process, so data version bumps aren't seen by other
+    worker processes; results there stay stale until their timeout.
+
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_expiry(self, timeout):
+        if hasattr(self, 'get_backend_timeout'):
+            return self.get_backend_timeout(timeout)
+        # Django < 1.6
+        if timeout is None:
+            timeout = self.default_timeout
+        return time.time() + timeout
+
+    def _get_live(self, key):
+        """Get ``(expiry, value)`` for a key, dropping it if expired.
+
+        Must be called with the lock held.
+
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expiry = entry[0]
+        if expiry is not None and expiry <= time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def _store(self, key, value, timeout):
+        """Store a value and evict old keys. Must be called with the lock."""
+        self._data[key] = (self._get_expiry(timeout), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self._max_entries:
+            self._data.popitem(last=False)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None,
+            **kwargs):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            if self._get_live(key) is not None:
+                return False
+            self._store(key, value, timeout)
+            return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            entry = self._get_live(key)
+        return default if entry is None else entry[1]
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None,
+            **kwargs):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            self._store(key, value, timeout)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            entry = self._get_live(key)
+            if entry is None:
+                raise ValueError("Key '{}' not found".format(key))
+            expiry, value = entry
+            self._data[key] = (expiry, value + delta)
+        return value + delta
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            return self._get_live(key) is not None
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,101 @@
+"""JSON encoders for autocomplete responses.
+
+Every encoder takes a Python object and returns the JSON as ``bytes``, ready
+to be used as a response body without being encoded again.
+
+The encoder is chosen with the ``SIMPLESELECT_JSON_ENCODER`` setting, which
+may be one of:
+
+* ``'auto'`` (the default): the fastest one installed, trying ``orjson``,
+  then ``ujson``, then the standard library.
+
+* ``'orjson'``, ``'ujson'`` or ``'json'``: that library.
+
+* A dotted path to a callable, or the callable itself.
+
+"""
+import importlib
+import json
+
+import django.conf
+import django.core.exceptions
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def json_dumps(obj):
+    """Encode with the standard library's ``json`` module."""
+    return json.dumps(obj, separators=(',', ':')).encode('ascii')
+
+
+def orjson_dumps(obj):
+    """Encode with ``orjson``."""
+    return orjson.dumps(obj)
+
+
+def ujson_dumps(obj):
+    """Encode with ``ujson``."""
+    return ujson.dumps(obj).encode('ascii')
+
+
+ENCODERS = {
+    'json': json_dumps,
+    'orjson': orjson_dumps,
+    'ujson': ujson_dumps,
+}
+
+# in order of preference for 'auto'
+LIBRARIES = [('orjson', orjson), ('ujson', ujson)]
+
+
+def find_encoder(name):
+    """Get the encoder for a ``SIMPLESELECT_JSON_ENCODER`` value.
+
+    >>> find_encoder('json') is json_dumps
+    True
+
+    """
+    if callable(name):
+        return name
+    if name == 'auto':
+        for library_name, library in LIBRARIES:
+            if library is not None:
+                return ENCODERS[library_name]
+        return json_dumps
+    if name in ENCODERS:
+        if name != 'json' and dict(LIBRARIES)[name] is None:
+            raise django.core.exceptions.ImproperlyConfigured(
+                "SIMPLESELECT_JSON_ENCODER is {!r} but it isn't installed."
+                .format(name))
+        return ENCODERS[name]
+    module_name, _, attr = name.rpartition('.')
+    return getattr(importlib.import_module(module_name), attr)
+
+
+_encoders = {}
+
+
+def get_encoder():
+    """Get the encoder selected by the ``SIMPLESELECT_JSON_ENCODER`` setting.
+
+    The result of looking up each setting value is remembered.
+
+    """
+    name = getattr(django.conf.settings, 'SIMPLESELECT_JSON_ENCODER', 'auto')
+    encoder = _encoders.get(name)
+    if encoder is None:
+        encoder = _encoders[name] = find_encoder(name)
+    return encoder
+
+
+def dumps(obj):
+    """Encode ``obj`` with the configured encoder."""
+    return get_encoder()(obj)
@@ -1,8 +1,15 @@
 import hashlib
+import importlib
+import logging
 
+import django.conf
+import django.core.exceptions
 import django.db.models
 import django.forms
 
+from . import bundles
+from . import cache
+from . import labels
 from . import widgets
 
 
@@ -15,6 +22,30 @@ def sha1(s):
 
 REGISTRY = {}
 
+logger = logging.getLogger(__name__)
+
+#: The length of registry keys made from hashes; colliding keys get longer.
+KEY_LENGTH = 5
+
+
+def autodiscover(modules=()):
+    """Import modules so the fields they define get registered.
+
+    :type  modules: seq of str
+    :param modules: Names of the modules to import. By default, the
+                    ``forms`` module of every installed app which has one.
+
+    """
+    if modules:
+        for name in modules:
+            importlib.import_module(name)
+        return
+    for app in django.conf.settings.INSTALLED_APPS:
+        try:
+            importlib.import_module(app + '.forms')
+        except ImportError:
+            pass
+
 
 def get_qualname(cls):
     """Get the fully qualified name of a class.
@@ -31,27 +62,221 @@ def get_qualname(cls):
     return qualname
 
 
+def get_explicit_key(cls):
+    """Get the key a field class asks for, or ``None``.
+
+    That's its own ``registry_key`` attribute (not an inherited one), or
+    else its entry in the ``SIMPLESELECT_REGISTRY_KEYS`` setting, a map of
+    dotted class names to keys.
+
+    """
+    key = cls.__dict__.get('registry_key')
+    if key is None:
+        keys = getattr(django.conf.settings, 'SIMPLESELECT_REGISTRY_KEYS', {})
+        key = keys.get(get_qualname(cls))
+    return None if key is None else str(key)
+
+
+def register(cls, registry=None):
+    """Add a field class to the registry and store its key on it.
+
+    Without an explicit key (see :py:func:`get_explicit_key`), the key is the
+    first ``KEY_LENGTH`` characters of the SHA1 hash of the class's dotted
+    name. If another class already has that key, the new class takes one
+    more character of its hash, and so on, and a warning is logged: which
+    class gets the longer key depends on the order they're imported in, so
+    give one of them a ``registry_key``. A class never loses its key to a
+    class registered after it, since pages may already link to it.
+
+    Defining a class with the same dotted name again replaces the old one.
+
+    :raises django.core.exceptions.ImproperlyConfigured:
+        If a class asks for an explicit key another class already has.
+
+    """
+    if registry is None:
+        registry = REGISTRY
+    qualname = get_qualname(cls)
+
+    explicit = get_explicit_key(cls)
+    if explicit is not None:
+        other = registry.get(explicit)
+        if other is not None and get_qualname(other) != qualname:
+            raise django.core.exceptions.ImproperlyConfigured(
+                "{} can't use the registry key {!r}, {} already has it."
+                .format(qualname, explicit, get_qualname(other)))
+        key = explicit
+    else:
+        digest = sha1(qualname)
+        for length in range(KEY_LENGTH, len(digest) + 1):
+            key = digest[:length]
+            other = registry.get(key)
+            if other is None or get_qualname(other) == qualname:
+                break
+            logger.warning("The registry key %r of %s is taken by %s; set "
+                           "registry_key on one of them.", key, qualname,
+                           get_qualname(other))
+    registry[key] = cls
+    cls._registry_key = key
+
+
+def uses_versions(cls):
+    """Check whether a field class uses the data versions of its models
+    (see :py:mod:`simpleselect.cache`), so they need to be bumped on every
+    save and delete.
+
+    Those are fields with ``cache_timeout``, ``http_max_age`` or
+    ``bundle_max_rows`` set, or with an in-memory ``search_backend``.
+
+    """
+    if getattr(cls, 'data', None) is None:
+        return False
+    return (cls.cache_timeout is not None or cls.http_max_age is not None or
+            cls.bundle_max_rows is not None or
+            getattr(cls.search_backend, 'check_versions', False))
+
+
 class AutoRegister(type):
 
     def __init__(cls, name, bases, namespace):
         if cls.__module__ != __name__:
-            key = cls.registry_key_func()
-            REGISTRY[key] = cls
+            register(cls)
+
+            if uses_versions(cls):
+                for model in cache.get_field_models(cls):
+                    cache.watch(model)
 
         super().__init__(name, bases, namespace)
 
 
 class AutoSelectField(django.forms.ModelChoiceField, metaclass=AutoRegister):
 
+    #: A short key, e.g. ``'person'`` or ``1``, naming the field in
+    #: autocomplete URLs instead of one made from the hash of its dotted
+    #: name. It must be unique. See :py:func:`register`.
+    registry_key = None
+
+    # set by register()
+    _registry_key = None
+
+    #: The most suggestions sent back for one search request; further results
+    #: are fetched page by page. ``None`` removes the limit.
+    max_results = 20
+
+    #: A format string building each suggestion's label from named columns,
+    #: e.g. ``'{first_name} {last_name} ({company__name})'``. The search then
+    #: runs as one ``values()`` query and never calls ``__str__``.
+    label_format = None
+
+    #: Relations to ``select_related`` when labels come from ``__str__``.
+    #: ``None`` follows every foreign key of the model; ``()`` turns it off.
+    label_related = None
+
+    #: The most search terms used; further ones are ignored. Repeated terms,
+    #: and ones made redundant by others (like "jo" next to "john" when all
+    #: ``queries`` are ``icontains``), are dropped before counting.
+    max_terms = 10
+
+    #: Longer search terms are cut short. ``None`` allows any length.
+    max_term_length = 100
+
+    #: Shorter search terms are ignored, as they'd match too much; when no
+    #: term is left, the search is answered as "too broad" without a query.
+    #: ``None`` allows any length.
+    min_term_length = None
+
+    #: Search terms that are ignored in the same way, e.g. words most labels
+    #: contain. Compared without regard to case.
+    stop_terms = ()
+
+    #: Remove accents from search terms, so "José" is searched as "Jose".
+    #: Only useful if the database or ``search_backend`` ignores accents in
+    #: the searched columns too.
+    strip_accents = False
+
+    #: Fields with at most this many rows are searched in the browser: the
+    #: page gets the URL of a bundle of all choices, which is fetched once.
+    #: See :py:mod:`simpleselect.bundles`. ``None`` turns this off.
+    bundle_max_rows = None
+
+    #: The database alias searches and ID lookups read from, e.g. a replica.
+    #: Defaults to the ``SIMPLESELECT_DATABASE`` setting, and without that,
+    #: to wherever ``data`` reads from. IDs the alias doesn't have yet are
+    #: looked up again in ``data``'s own database.
+    database = None
+
+    #: Seconds to keep search results in the cache named by the
+    #: ``SIMPLESELECT_CACHE`` setting; ``None`` turns caching off. Saving or
+    #: deleting an instance of the ``data`` model invalidates the results.
+    cache_timeout = None
+
+    #: Other models whose changes should invalidate cached results, e.g. a
+    #: related model the labels are built from.
+    cache_dependencies = ()
+
+    #: An object with a ``filter(field, queryset, terms)`` method returning
+    #: the matching part of ``queryset``, used instead of the ``queries``
+    #: lookups. See :py:mod:`simpleselect.index` for the provided ones.
+    search_backend = None
+
+    #: Compile the SQL condition of a search once per number of terms and
+    #: only bind the terms on each request, instead of building and compiling
+    #: it every time. Searches on columns of related models aren't compiled.
+    compile_search = False
+
+    #: Put exact matches first, then prefix matches, then the rest. Done in
+    #: the database; see :py:func:`simpleselect.views.rank_objects`.
+    rank_results = False
+
+    #: Stream search responses, encoding results as they are read from the
+    #: database. Meant for fields with a large (or no) ``max_results``.
+    #: Doesn't apply to cached results.
+    stream_results = False
+
+    #: Seconds browsers and proxies may reuse a response for, sent as
+    #: ``Cache-Control: max-age``. Setting it (``0`` to always revalidate)
+    #: also adds an ``ETag`` and ``Last-Modified`` made from the data version,
+    #: so repeated requests get ``304 Not Modified`` until the data changes.
+    #: ``None`` sends no caching headers.
+    http_max_age = None
+
+    #: Whether responses depend on who is logged in. They're then marked
+    #: ``private`` and vary on the ``Cookie`` header.
+    http_private = False
+
     @classmethod
     def registry_key_func(cls):
-        return sha1(get_qualname(cls))[:5]
+        """Get the key the field is registered under, which names it in
+        autocomplete URLs (see :py:func:`register`)."""
+        return cls._registry_key
+
+    @classmethod
+    def lookup_labels(cls, ids):
+        """Get a map of the given IDs (as strings) to labels, with one query.
+
+        IDs which don't exist are left out.
+
+        """
+        return {str(choice.pk): choice.label
+                for choice in labels.lookup(cls.data, ids, cls.label_format,
+                                            cls.label_related)}
+
+    @classmethod
+    def get_bundle_version(cls):
+        """Get the version of the field's choice bundle, or ``None`` if it
+        isn't bundled."""
+        return bundles.get_bundle_version(cls)
 
     def __init__(self, *args, **kwargs):
         if not 'widget' in kwargs:
+            key = type(self).registry_key_func()
             widget = widgets.AutocompleteSelect(
                 queries=self.queries,
-                token_generator=lambda w: type(self).registry_key_func())
+                token_generator=lambda w: key,
+                label_lookup=type(self).lookup_labels,
+                min_term_length=self.min_term_length,
+                stop_terms=self.stop_terms,
+                bundle_version=type(self).get_bundle_version)
             widget.choices = self.data
             kwargs['widget'] = widget
         super().__init__(self.data, *args, **kwargs)
@@ -0,0 +1,463 @@
+"""In-memory search indexes, usable as ``AutoSelectField.search_backend``.
+
+These avoid ``LIKE '%term%'`` queries, which can't use a database index and
+so scan the whole table for every keystroke. Instead each worker process
+builds an index of the searchable columns the first time a field is searched.
+The index is kept up to date from the ``post_save`` and ``post_delete``
+signals of the field's model, and rebuilt if the field's data version (see
+:py:mod:`simpleselect.cache`) changes behind its back, e.g. because another
+process saved an object.
+
+"""
+import array
+import bisect
+import collections
+import re
+import threading
+
+import django.db.models
+import django.db.models.signals
+
+from . import cache
+from . import labels
+from . import views
+
+
+def tokenize(value):
+    """Split a value into lowercase words.
+
+    >>> tokenize('Mary-Jane  Smith')
+    ['mary', 'jane', 'smith']
+
+    """
+    if value is None:
+        return []
+    return re.findall(r'\w+', str(value).lower())
+
+
+class TokenIndex:
+    """A sorted list of ``(token, pk)`` pairs supporting prefix lookups."""
+
+    def __init__(self, rows=()):
+        """Build an index.
+
+        :type  rows: iterable
+        :param rows: ``(pk, value, value, ...)`` tuples, like the ones from
+                     ``values_list('pk', *columns)``.
+
+        """
+        self.entries = []
+        self.tokens_by_pk = {}
+        for row in rows:
+            tokens = self.get_tokens(row)
+            self.tokens_by_pk[row[0]] = tokens
+            self.entries.extend((token, row[0]) for token in tokens)
+        self.entries.sort()
+
+    @staticmethod
+    def get_tokens(row):
+        """Get the distinct tokens of all columns in a row."""
+        tokens = set()
+        for value in row[1:]:
+            tokens.update(tokenize(value))
+        return tuple(tokens)
+
+    def add(self, row):
+        """Add (or replace) one row."""
+        self.remove(row[0])
+        tokens = self.get_tokens(row)
+        self.tokens_by_pk[row[0]] = tokens
+        for token in tokens:
+            bisect.insort(self.entries, (token, row[0]))
+
+    def remove(self, pk):
+        """Remove the row with the given primary key, if it's indexed."""
+        for token in self.tokens_by_pk.pop(pk, ()):
+            i = bisect.bisect_left(self.entries, (token, pk))
+            del self.entries[i]
+
+    def prefix_matches(self, prefix):
+        """Get the primary keys having a token which starts with ``prefix``.
+
+        :rtype: set
+
+        """
+        pks = set()
+        i = bisect.bisect_left(self.entries, (prefix,))
+        while i < len(self.entries) and self.entries[i][0].startswith(prefix):
+            pks.add(self.entries[i][1])
+            i += 1
+        return pks
+
+    def search(self, terms):
+        """Get the primary keys matching every word of every term.
+
+        A word matches if it's a prefix of any word in any column, so this
+        is the prefix-per-word version of ANDing terms which are each ORed
+        across all columns.
+
+        :rtype: set or None
+        :returns: The matching primary keys, or ``None`` if there are no
+                  words to search for at all.
+
+        """
+        result = None
+        for term in terms:
+            for word in tokenize(term):
+                matches = self.prefix_matches(word)
+                result = matches if result is None else result & matches
+                if not result:
+                    return result
+        return result
+
+
+class InMemoryBackend:
+    """Base class for search backends keeping one index per field in memory.
+
+    Subclasses implement :py:meth:`get_rows`, :py:meth:`build` and
+    :py:meth:`filter`. The index objects they build need ``add(row)`` and
+    ``remove(pk)`` methods, which are used to apply single changes.
+
+    """
+
+    def __init__(self, check_versions=True):
+        """Create an in-memory search backend.
+
+        :type  check_versions: bool
+        :param check_versions: Whether to compare the field's data version
+                               before every search, and rebuild the index if it
+                               changed. Turn this off if only this process
+                               ever changes the data.
+
+        """
+        self.check_versions = check_versions
+        self.indexes = {}
+        self.versions = {}
+        self.lock = threading.RLock()
+
+    def get_rows(self, field, qset):
+        """Get an iterable of index rows, one per object in ``qset``.
+
+        Each row is a tuple starting with the object's primary key.
+
+        """
+        raise NotImplementedError
+
+    def build(self, field, rows):
+        """Build a new index for ``field`` out of ``get_rows()`` rows."""
+        raise NotImplementedError
+
+    def get_versions(self, field):
+        """Get the data versions the index of ``field`` depends on."""
+        if not self.check_versions:
+            return None
+        return cache.get_versions(cache.get_field_models(field))
+
+    def get_index(self, field):
+        """Get the index for ``field``, (re)building it if needed."""
+        key = field.registry_key_func()
+        versions = self.get_versions(field)
+        with self.lock:
+            if key not in self.indexes or self.versions[key] != versions:
+                if key not in self.indexes:
+                    self.connect(field)
+                self.indexes[key] = self.build(
+                    field, self.get_rows(field, field.data))
+                self.versions[key] = versions
+            return self.indexes[key]
+
+    def refresh(self, field, pk):
+        """Re-read the object with primary key ``pk`` into the index."""
+        key = field.registry_key_func()
+        rows = list(self.get_rows(field, field.data.filter(pk=pk)))
+        with self.lock:
+            if rows:
+                self.indexes[key].add(rows[0])
+            else:
+                self.indexes[key].remove(pk)
+            # this process's own change is already applied
+            self.versions[key] = self.get_versions(field)
+
+    def connect(self, field):
+        """Keep ``field``'s index up to date when its model changes."""
+
+        def refresh(sender, instance, **kwargs):
+            self.refresh(field, instance.pk)
+
+        uid = 'simpleselect.index.{}.{}'.format(id(self),
+                                                 field.registry_key_func())
+        model = field.data.model
+        for signal in (django.db.models.signals.post_save,
+                       django.db.models.signals.post_delete):
+            signal.connect(refresh, sender=model, weak=False,
+                           dispatch_uid=uid)
+
+    def filter(self, field, qset, terms):
+        """Get the objects of ``qset`` matching ``terms``."""
+        raise NotImplementedError
+
+
+class PrefixIndex(InMemoryBackend):
+    """A search backend matching each word as a prefix of a column's words.
+
+    For example, with ``queries = ['first_name__icontains',
+    'last_name__icontains']`` the search "joh smi" finds "John Smith" and
+    "Smith, Johanna" but, unlike ``icontains``, not "Bojohn".
+
+    Only the columns of ``queries`` are used; the lookup types are ignored.
+    Use one instance per field::
+
+        class PersonField(simpleselect.AutoSelectField):
+            queries = ['first_name__icontains', 'last_name__icontains']
+            data = models.Person.objects.all()
+            search_backend = simpleselect.index.PrefixIndex()
+
+    """
+
+    def __init__(self, max_candidates=500, **kwargs):
+        """Create a prefix index backend.
+
+        :type  max_candidates: int
+        :param max_candidates: At most this many matches are passed to the
+                               database as a ``pk__in`` filter. Searches
+                               matching more, which only short terms tend
+                               to, fall back to the ``queries`` lookups;
+                               those find every prefix match too.
+
+        Other arguments are passed to :py:class:`InMemoryBackend`.
+
+        """
+        super().__init__(**kwargs)
+        self.max_candidates = max_candidates
+
+    def get_rows(self, field, qset):
+        """Get ``(pk, value, ...)`` tuples of the ``queries`` columns."""
+        return qset.values_list('pk', *views.get_columns(field)).iterator()
+
+    def build(self, field, rows):
+        return TokenIndex(rows)
+
+    def filter(self, field, qset, terms):
+        """Narrow ``qset`` down to the objects matching ``terms``."""
+        index = self.get_index(field)
+        with self.lock:
+            pks = index.search(terms)
+        if pks is None:
+            return qset
+        if len(pks) > self.max_candidates:
+            return views.query(qset.filter, terms, field.queries,
+                               django.db.models.Q, views.create_queries,
+                               views.and_together)
+        return qset.filter(pk__in=sorted(pks))
+
+
+def trigrams(value):
+    """Get the set of three-character substrings of a string.
+
+    >>> sorted(trigrams('anna'))
+    ['ann', 'nna']
+
+    """
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+#: How each lookup type compares a column value (as given and lowercased)
+#: against a search term (likewise).
+MATCHERS = {
+    'exact': lambda v, lv, t, lt: v == t,
+    'iexact': lambda v, lv, t, lt: lv == lt,
+    'contains': lambda v, lv, t, lt: t in v,
+    'icontains': lambda v, lv, t, lt: lt in lv,
+    'startswith': lambda v, lv, t, lt: v.startswith(t),
+    'istartswith': lambda v, lv, t, lt: lv.startswith(lt),
+    'endswith': lambda v, lv, t, lt: v.endswith(t),
+    'iendswith': lambda v, lv, t, lt: lv.endswith(lt),
+}
+
+
+class TrigramTable:
+    """Rows of ``(pk, label, value, ...)`` with a trigram index over values.
+
+    Rows live in parallel lists and are referred to by their position, their
+    *slot*. Each trigram maps to an array of the slots containing it, in
+    increasing order. Removed rows leave an empty slot behind until the table
+    is rebuilt.
+
+    """
+
+    def __init__(self, lookups, rows=()):
+        """Build a table.
+
+        :type  lookups: seq of (int, str) pairs
+        :param lookups: For each query, the position of its column among the
+                        row's values and its lookup type, e.g.
+                        ``[(0, 'icontains'), (1, 'istartswith')]``.
+
+        """
+        for _, lookup in lookups:
+            if lookup not in MATCHERS:
+                raise ValueError("Lookup type {!r} can't be searched in "
+                                 "memory.".format(lookup))
+        self.lookups = [(i, MATCHERS[lookup]) for i, lookup in lookups]
+        self.pks = []
+        self.labels = []
+        self.values = []
+        self.lowered = []
+        self.slots = {}
+        self.postings = collections.defaultdict(lambda: array.array('l'))
+        self.removed = 0
+        for row in rows:
+            self.add(row)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def add(self, row):
+        """Add (or replace) a ``(pk, label, value, ...)`` row."""
+        pk, label = row[:2]
+        self.remove(pk)
+        values = tuple('' if v is None else str(v) for v in row[2:])
+        lowered = tuple(v.lower() for v in values)
+        slot = len(self.pks)
+        self.pks.append(pk)
+        self.labels.append(label)
+        self.values.append(values)
+        self.lowered.append(lowered)
+        self.slots[pk] = slot
+        grams = set()
+        for value in lowered:
+            grams.update(trigrams(value))
+        for gram in grams:
+            self.postings[gram].append(slot)
+
+    def remove(self, pk):
+        """Remove the row with the given primary key, if there is one."""
+        slot = self.slots.pop(pk, None)
+        if slot is not None:
+            self.pks[slot] = self.labels[slot] = None
+            self.values[slot] = self.lowered[slot] = None
+            self.removed += 1
+
+    def rows(self):
+        """Iterate over the rows still in the table, in slot order."""
+        for slot, pk in enumerate(self.pks):
+            if self.values[slot] is not None:
+                yield (pk, self.labels[slot]) + self.values[slot]
+
+    def get_candidates(self, term):
+        """Get the slots which may match ``term``, in increasing order."""
+        grams = trigrams(term.lower())
+        if not grams:
+            return range(len(self.pks))
+        if any(gram not in self.postings for gram in grams):
+            return []
+        postings = sorted((self.postings[gram] for gram in grams), key=len)
+        slots = set(postings[0])
+        for other in postings[1:]:
+            slots.intersection_update(other)
+        return sorted(slots)
+
+    def matches(self, slot, term, lowered_term):
+        """Check whether the row in ``slot`` matches a term on any query."""
+        values = self.values[slot]
+        if values is None:
+            return False
+        lowered = self.lowered[slot]
+        return any(match(values[i], lowered[i], term, lowered_term)
+                   for i, match in self.lookups)
+
+    def search(self, terms):
+        """Get :py:class:`simpleselect.labels.Choice` objects for all rows
+        matching every term, in slot order."""
+        slots = None
+        for term in terms:
+            lowered_term = term.lower()
+            candidates = self.get_candidates(term)
+            if slots is not None:
+                candidates = sorted(slots.intersection(candidates))
+            slots = {slot for slot in candidates
+                     if self.matches(slot, term, lowered_term)}
+        if slots is None:
+            slots = self.slots.values()
+        return [labels.Choice(self.pks[s], self.labels[s])
+                for s in sorted(slots)]
+
+
+class TrigramIndex(InMemoryBackend):
+    """A search backend answering searches without touching the database.
+
+    Meant for reference tables of up to a few hundred thousand rows that
+    rarely change. Every worker loads the primary key, label and ``queries``
+    columns of all objects once, and searches them with the same semantics as
+    the database: a row matches a term if any query matches it, and it has to
+    match every term. Trigrams are used to find candidate rows quickly.
+
+    Labels are computed with the field's ``label_format`` or ``__str__`` at
+    load time. Lookup types other than the ``exact``, ``contains``,
+    ``startswith`` and ``endswith`` families aren't supported.
+
+    """
+
+    def __init__(self, compact_ratio=0.5, **kwargs):
+        """Create a trigram index backend.
+
+        :type  compact_ratio: float
+        :param compact_ratio: Rebuild a table once this fraction of its slots
+                              has been freed by updates and deletions.
+
+        Other arguments are passed to :py:class:`InMemoryBackend`.
+
+        """
+        super().__init__(**kwargs)
+        self.compact_ratio = compact_ratio
+
+    def get_lookups(self, field):
+        """Get the ``(column position, lookup type)`` pair of every query."""
+        columns = views.get_columns(field)
+        lookups = []
+        for query_string in field.queries:
+            column, lookup = views.split_query(query_string)
+            lookups.append((columns.index(column), lookup))
+        return lookups
+
+    def get_rows(self, field, qset):
+        """Get ``(pk, label, value, ...)`` tuples, ordered by primary key.
+
+        The values and the labels come from two queries. Objects created
+        between them are left out; the index learns about them from the
+        ``post_save`` signal or, if they were saved by another process, the
+        data version.
+
+        """
+        qset = qset.order_by('pk')
+        values = {row[0]: row[1:] for row in
+                  qset.values_list('pk', *views.get_columns(field)).iterator()}
+        label_qset = labels.prepare_queryset(qset, field.label_format,
+                                             field.label_related)
+        for obj in label_qset.iterator():
+            pk = labels.get_pk(obj)
+            if pk not in values:
+                continue
+            label = labels.make_label(obj, field.label_format)
+            yield (pk, label) + values[pk]
+
+    def build(self, field, rows):
+        return TrigramTable(self.get_lookups(field), rows)
+
+    def refresh(self, field, pk):
+        super().refresh(field, pk)
+        key = field.registry_key_func()
+        with self.lock:
+            table = self.indexes[key]
+            if table.removed > len(table.pks) * self.compact_ratio:
+                self.indexes[key] = self.build(field, table.rows())
+
+    def filter(self, field, qset, terms):
+        """Get a list of :py:class:`simpleselect.labels.Choice` objects.
+
+        ``qset`` is ignored; the index always holds all of ``field.data``.
+
+        """
+        table = self.get_index(field)
+        with self.lock:
+            return table.search(terms)
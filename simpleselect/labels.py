@@ -0,0 +1,126 @@
+"""Building the text labels shown next to each autocomplete suggestion."""
+import collections
+import string
+
+import django.db.models
+
+
+class Choice(collections.namedtuple('Choice', 'pk label')):
+    """An object with a precomputed label, e.g. from an in-memory index."""
+
+    __slots__ = ()
+
+    def __str__(self):
+        return self.label
+
+
+def get_label_columns(label_format):
+    """Get the names of the columns a label format string refers to.
+
+    :type  label_format: str
+    :param label_format: A `format string`_ using only named fields, e.g.
+                         ``'{first_name} {last_name} ({company__name})'``.
+                         Every field name must be something that can be given
+                         to ``QuerySet.values()``.
+
+    :rtype: list of str
+    :returns: The field names in order of first appearance.
+
+    >>> get_label_columns('{last_name}, {first_name} ({company__name})')
+    ['last_name', 'first_name', 'company__name']
+
+    .. _format string: https://docs.python.org/3/library/string.html#formatstrings
+
+    """
+    columns = []
+    for _, name, _, _ in string.Formatter().parse(label_format):
+        if name is None:
+            continue
+        if not name or name.isdigit():
+            raise ValueError("Label format {!r} must only use named fields."
+                             .format(label_format))
+        if name not in columns:
+            columns.append(name)
+    return columns
+
+
+def get_related_fields(model):
+    """Get the names of all forward foreign keys on ``model``.
+
+    These are the relations a model's ``__str__`` is likely to follow, so
+    they're handed to ``select_related`` to fetch them in the same query.
+
+    """
+    return [f.name for f in model._meta.fields
+            if isinstance(f, django.db.models.ForeignKey)]
+
+
+def prepare_queryset(qset, label_format=None, label_related=None):
+    """Make a QuerySet fetch everything its labels need in one query.
+
+    :type  label_format: str or None
+    :param label_format: If given, the QuerySet becomes a ``values()`` query
+                         of the primary key and the columns named by the
+                         format, so no model instances are created at all.
+
+    :type  label_related: seq of str or None
+    :param label_related: Without a ``label_format``, labels come from
+                          ``str(obj)``; these relations are passed to
+                          ``select_related``. ``None`` means every forward
+                          foreign key of the model, and an empty sequence
+                          turns this off. Ignored if ``qset`` already has
+                          ``select_related`` applied.
+
+    """
+    if label_format is not None:
+        # keep extra columns, e.g. ranks which the query is ordered by
+        extra = list(qset.query.extra)
+        return qset.values('pk', *(get_label_columns(label_format) + extra))
+
+    if qset.query.select_related:
+        return qset
+    if label_related is None:
+        label_related = get_related_fields(qset.model)
+    if not label_related:
+        return qset
+    return qset.select_related(*label_related)
+
+
+def make_label(obj, label_format=None):
+    """Get the label for one object or ``values()`` row.
+
+    >>> make_label({'pk': 1, 'name': 'Acme'}, '{name} (#{pk})')
+    'Acme (#1)'
+
+    """
+    if label_format is None or isinstance(obj, Choice):
+        return str(obj)
+    return label_format.format(**obj)
+
+
+def get_pk(obj):
+    """Get the primary key of a model instance or a ``values()`` row."""
+    if isinstance(obj, dict):
+        return obj['pk']
+    return obj.pk
+
+
+def lookup(qset, ids, label_format=None, label_related=None):
+    """Get labels for the objects of ``qset`` with the given IDs.
+
+    Everything is fetched with one query, see :py:func:`prepare_queryset`.
+
+    :type  ids: seq
+    :param ids: Primary keys, possibly as strings (e.g. from a querystring).
+
+    :rtype: list of :py:class:`Choice`
+    :returns: The found objects in the order of ``ids``; IDs which don't
+              exist are left out, and duplicates are only returned once.
+
+    """
+    ids = list(collections.OrderedDict.fromkeys(str(id) for id in ids))
+    objects = prepare_queryset(qset.filter(pk__in=ids), label_format,
+                               label_related)
+    found = {str(get_pk(o)): Choice(get_pk(o), make_label(o, label_format))
+             for o in objects}
+    return [found[id] for id in ids if id in found]
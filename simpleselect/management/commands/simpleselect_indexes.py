@@ -0,0 +1,26 @@
+import django.db
+from django.core.management.base import BaseCommand
+
+from simpleselect import fields
+
+
+class Command(BaseCommand):
+    args = '<module module ...>'
+    help = ("Print the SQL creating the database indexes needed by the "
+            "search backends of all AutoSelectFields.\n\n"
+            "Fields are found by importing the given modules, or else the "
+            "'forms' module of every installed app.")
+
+    def handle(self, *modules, **options):
+        fields.autodiscover(modules)
+
+        connection = django.db.connection
+        for key, field in sorted(fields.REGISTRY.items()):
+            get_index_sql = getattr(field.search_backend, 'get_index_sql',
+                                    None)
+            if get_index_sql is None:
+                continue
+            self.stdout.write('-- {}.{} ({})\n'.format(
+                field.__module__, field.__name__, key))
+            for statement in get_index_sql(field, connection):
+                self.stdout.write(statement + '\n')
@@ -0,0 +1,52 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from simpleselect import fields
+from simpleselect import stats
+
+
+def format_number(value, template='{:.1f}'):
+    return '-' if value is None else template.format(value)
+
+
+class Command(BaseCommand):
+    args = '<module module ...>'
+    help = ("Print the request statistics of all AutoSelectFields, the ones "
+            "taking the most time in total first. Needs the "
+            "SIMPLESELECT_STATS setting.\n\n"
+            "Fields are found by importing the given modules, or else the "
+            "'forms' module of every installed app.")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--reset', action='store_true', default=False,
+                    help='Set all counters back to zero afterwards.'),
+    )
+
+    def handle(self, *modules, **options):
+        fields.autodiscover(modules)
+        registered = list(fields.REGISTRY.values())
+        field_stats = stats.get_stats(registered)
+        field_stats.sort(key=lambda s: s['total_ms'], reverse=True)
+
+        buckets = (['<={}'.format(bound) for bound in stats.LATENCY_BUCKETS] +
+                   ['>{}'.format(stats.LATENCY_BUCKETS[-1])])
+        bounds = ' '.join('{:<7}'.format(bucket) for bucket in buckets)
+        self.stdout.write(
+            '{:<5} {:>8} {:>10} {:>8} {:>7} {:>7} {:>6}  {} field\n'
+            .format('key', 'requests', 'total ms', 'mean ms', 'queries',
+                    'rows', 'hits', bounds))
+        for s in field_stats:
+            histogram = ' '.join('{:<7}'.format(count)
+                                 for _, count in s['latency'])
+            self.stdout.write(
+                '{:<5} {:>8} {:>10.1f} {:>8} {:>7} {:>7} {:>6}  {} {}\n'
+                .format(s['key'], s['requests'], s['total_ms'],
+                        format_number(s['mean_ms']),
+                        format_number(s['queries']),
+                        format_number(s['rows']),
+                        format_number(s['cache_hit_ratio'], '{:.0%}'),
+                        histogram, s['field']))
+
+        if options['reset']:
+            stats.reset(registered)
@@ -0,0 +1,173 @@
+"""PostgreSQL search backends, usable as ``AutoSelectField.search_backend``.
+
+On PostgreSQL, Django compiles ``icontains`` to ``UPPER(col::text) LIKE
+UPPER(%s)``, which a ``pg_trgm`` index on ``col`` can't serve. These backends
+write their conditions so that GIN indexes are used, and order suggestions by
+relevance. The ``simpleselect_indexes`` management command prints the SQL
+creating the matching indexes.
+
+Only columns of the field's own model can be searched, i.e. ``queries`` may
+not follow relations.
+
+"""
+import re
+
+import django.core.exceptions
+import django.db
+
+from .views import RANK_COLUMN, get_column_sql, get_columns
+
+
+def check_connection(connection):
+    """Raise ImproperlyConfigured if ``connection`` isn't to PostgreSQL."""
+    if connection.vendor != 'postgresql':
+        raise django.core.exceptions.ImproperlyConfigured(
+            "simpleselect.postgres backends need PostgreSQL, not {}."
+            .format(connection.vendor))
+
+
+def escape_like(term):
+    r"""Escape the wildcard characters of a LIKE pattern.
+
+    >>> print(escape_like('100%_sure\\'))
+    100\%\_sure\\
+
+    """
+    return re.sub(r'([\\%_])', r'\\\1', term)
+
+
+def get_index_name(*parts):
+    """Make an index name out of ``parts``, within PostgreSQL's 63 bytes.
+
+    >>> get_index_name('demo_person', 'first_name', 'trgm')
+    'simpleselect_demo_person_first_name_trgm'
+
+    """
+    return '_'.join(('simpleselect',) + parts)[:63]
+
+
+class TrigramSearch:
+    """Search with ``ILIKE`` served by ``pg_trgm`` GIN indexes, ranked by
+    trigram similarity.
+
+    Matching works like ``icontains``: every term has to occur in one of the
+    columns. Results are ordered by the sum, over the terms, of the best
+    ``similarity()`` between the term and any column, so close matches come
+    first.
+
+    """
+
+    def get_columns_sql(self, field, connection):
+        return [get_column_sql(field, column, connection)
+                for column in get_columns(field)]
+
+    def filter(self, field, qset, terms):
+        """Narrow ``qset`` down to the objects matching ``terms``, best
+        first."""
+        if not terms:
+            return qset
+        connection = django.db.connections[qset.db]
+        check_connection(connection)
+        columns = self.get_columns_sql(field, connection)
+
+        where, params, ranks, rank_params = [], [], [], []
+        for term in terms:
+            where.append('({})'.format(' OR '.join(
+                '{} ILIKE %s'.format(column) for column in columns)))
+            params.extend(['%' + escape_like(term) + '%'] * len(columns))
+            ranks.append('GREATEST({})'.format(', '.join(
+                'similarity({}, %s)'.format(column) for column in columns)))
+            rank_params.extend([term] * len(columns))
+
+        return qset.extra(
+            where=where, params=params,
+            select={RANK_COLUMN: ' + '.join(ranks)},
+            select_params=rank_params,
+            order_by=['-' + RANK_COLUMN, qset.model._meta.pk.name])
+
+    def get_index_sql(self, field, connection):
+        """Get the statements creating the indexes this backend needs."""
+        opts = field.data.model._meta
+        qn = connection.ops.quote_name
+        statements = ['CREATE EXTENSION IF NOT EXISTS pg_trgm;']
+        for column in get_columns(field):
+            db_column = opts.get_field(column).column
+            statements.append(
+                'CREATE INDEX CONCURRENTLY {} ON {} USING gin ({} '
+                'gin_trgm_ops);'.format(
+                    qn(get_index_name(opts.db_table, db_column, 'trgm')),
+                    qn(opts.db_table), qn(db_column)))
+        return statements
+
+
+class FullTextSearch:
+    """Search with PostgreSQL full text search, ranked by ``ts_rank``.
+
+    All ``queries`` columns are combined into one document; every word of
+    every term has to be the prefix of a word in it. Words are normalized with
+    the given text search configuration, so e.g. with ``'english'`` "running"
+    finds "runs".
+
+    """
+
+    def __init__(self, config='simple'):
+        """Create a full text search backend.
+
+        :type  config: str
+        :param config: The name of a PostgreSQL text search configuration.
+
+        """
+        if not re.match(r'^\w+$', config):
+            raise ValueError("Invalid text search configuration {!r}"
+                             .format(config))
+        self.config = config
+
+    def get_vector_sql(self, field, connection):
+        """Get the ``tsvector`` expression of a field's columns.
+
+        The index created by :py:meth:`get_index_sql` is on exactly this
+        expression, so the two have to stay the same.
+
+        """
+        document = " || ' ' || ".join(
+            "coalesce({}, '')".format(get_column_sql(field, column,
+                                                     connection))
+            for column in get_columns(field))
+        return "to_tsvector('{}', {})".format(self.config, document)
+
+    @staticmethod
+    def make_tsquery(terms):
+        """Turn search terms into ``to_tsquery`` input matching prefixes.
+
+        >>> FullTextSearch.make_tsquery(["o'brien", 'jo'])
+        'o:* & brien:* & jo:*'
+
+        """
+        words = [word for term in terms for word in re.findall(r'\w+', term)]
+        return ' & '.join(word + ':*' for word in words)
+
+    def filter(self, field, qset, terms):
+        """Narrow ``qset`` down to the objects matching ``terms``, best
+        first."""
+        tsquery = self.make_tsquery(terms)
+        if not tsquery:
+            return qset
+        connection = django.db.connections[qset.db]
+        check_connection(connection)
+        vector = self.get_vector_sql(field, connection)
+        query = "to_tsquery('{}', %s)".format(self.config)
+
+        return qset.extra(
+            where=['{} @@ {}'.format(vector, query)], params=[tsquery],
+            select={RANK_COLUMN: 'ts_rank({}, {})'.format(vector, query)},
+            select_params=[tsquery],
+            order_by=['-' + RANK_COLUMN, qset.model._meta.pk.name])
+
+    def get_index_sql(self, field, connection):
+        """Get the statements creating the index this backend needs."""
+        opts = field.data.model._meta
+        qn = connection.ops.quote_name
+        columns = '_'.join(get_columns(field))
+        return ['CREATE INDEX CONCURRENTLY {} ON {} USING gin ({});'.format(
+            qn(get_index_name(opts.db_table, columns, 'fts')),
+            qn(opts.db_table), self.get_vector_sql(field, connection))]
@@ -0,0 +1,17 @@
+"""Signals sent by simpleselect."""
+import django.dispatch
+
+#: Sent after every autocomplete request when the ``SIMPLESELECT_STATS``
+#: setting is on. Arguments:
+#:
+#: * ``fields``: the AutoSelectField subclasses the request was for; a batched
+#:   lookup has several.
+#: * ``kind``: ``'search'``, ``'lookup'``, ``'batch'`` or ``'bundle'``.
+#: * ``duration``: seconds taken to build the response. For streamed responses
+#:   this doesn't include sending the results.
+#: * ``queries``: database queries run.
+#: * ``rows``: results in the response, or ``None`` if it was streamed.
+#: * ``cache_hit``: whether search results came from the cache, or ``None``
+#:   if the field doesn't cache them.
+request_measured = django.dispatch.Signal(providing_args=[
+    'fields', 'kind', 'duration', 'queries', 'rows', 'cache_hit'])
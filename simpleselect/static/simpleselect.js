@@ -66,9 +66,112 @@ var SimpleSelect = (function($) {
         // has to exist, then the display has to be set to that option
 
         // creates an option, or if the option already exists, does nothing
-        $selectize.addOption(text);
+        $selectize.addOption(dataItem);
 
-        $selectize.setValue(text.pk);  // updates the label
+        $selectize.setValue(dataItem.pk);  // updates the label
+    }
+
+
+    /**
+     * Show the label of dataItem, which was looked up for the widget of
+     * hiddenID.
+     *
+     * A widget which isn't activated yet only has a placeholder; the label
+     * is shown there and kept for the activation.
+     */
+    function showLabel(hiddenID, dataItem) {
+        var $hidden = $("#" + hiddenID);
+        if(String($hidden.val()) !== String(dataItem.pk)) {
+            // the value changed while the label was looked up
+            return;
+        }
+        $hidden.attr("data-simpleselect-label", dataItem.label);
+        if($hidden.data("simpleselectActive")) {
+            setText(hiddenID, dataItem);
+        } else {
+            $("#" + hiddenID + "_text").val(dataItem.label);
+        }
+    }
+
+
+    /**
+     * Split a widget URL like "/simpleselectquery/?field=abcde" into the
+     * service URL and the field's registry key.
+     */
+    function parseFieldURL(url) {
+        var match = /[?&]field=([^&]*)/.exec(url);
+        return {base: url.split("?")[0],
+                field: match ? decodeURIComponent(match[1]) : null};
+    }
+
+
+    // Label lookups waiting to be sent, grouped by service URL. Each entry is
+    // {hiddenID: ..., field: ..., id: ...}
+    var pendingLookups = {};
+    var flushScheduled = false;
+
+    // The most lookups to put in one request, to keep URLs short
+    var MAX_BATCH_SIZE = 100;
+
+
+    /**
+     * Send one request for a group of lookups to the same service URL.
+     */
+    function sendLookups(base, lookups) {
+        var params = $.map(lookups, function(lookup) {
+            return "lookup=" + encodeURIComponent(lookup.field + ":" +
+                                                  lookup.id);
+        });
+        $.getJSON(base + "?" + params.join("&"), function(data) {
+            $.each(lookups, function(i, lookup) {
+                $.each(data[lookup.field] || [], function(j, item) {
+                    if(String(item.pk) === String(lookup.id)) {
+                        showLabel(lookup.hiddenID, item);
+                        return false;
+                    }
+                });
+            });
+        }).always(function() {
+            // a label that wasn't found is asked for again on activation
+            $.each(lookups, function(i, lookup) {
+                $("#" + lookup.hiddenID)
+                    .removeData("simpleselectLabelPending");
+            });
+        });
+    }
+
+
+    /**
+     * Send all pending lookups, batched per service URL.
+     */
+    function flushLookups() {
+        var queued = pendingLookups;
+        pendingLookups = {};
+        flushScheduled = false;
+        $.each(queued, function(base, lookups) {
+            for(var i = 0; i < lookups.length; i += MAX_BATCH_SIZE) {
+                sendLookups(base, lookups.slice(i, i + MAX_BATCH_SIZE));
+            }
+        });
+    }
+
+
+    /**
+     * Queue a request for the label of `id` for the widget of `hiddenID`.
+     *
+     * Lookups queued while the current script runs (for instance while all
+     * widgets of a page are activated) are sent together afterwards, with one
+     * request per service URL.
+     */
+    function queueLookup(hiddenID, url, id) {
+        var parsed = parseFieldURL(url);
+        var lookups = pendingLookups[parsed.base] =
+            pendingLookups[parsed.base] || [];
+        lookups.push({hiddenID: hiddenID, field: parsed.field, id: id});
+        if(!flushScheduled) {
+            flushScheduled = true;
+            setTimeout(flushLookups, 0);
+        }
     }
 
 
@@ -79,26 +182,265 @@ var SimpleSelect = (function($) {
      * The UI widget to update is automatically selected based on hiddenID.
      *
      * The url parameter should point to a service that can give a label for a
-     * specified ID. The query parameter `id` is added to the string and then
-     * a get request is sent.
+     * specified ID; see queueLookup.
      */
     function updateOnChange(hiddenID, url) {
         $("#"+hiddenID).change(function() {
-
-            // add the 'id' querystring parameter
-            var glue = url.indexOf("&") >= 0 ? "?" : "&";
             var newID = $(this).val();
-            var requestURL = url + glue + "id=" + newID;
-
-            // request text for the new ID
-            $.getJSON(requestURL, null, function(data, textStatus) {
-                if(textStatus === "success") {
-                    setText(hiddenID, data[0]);
-                } else {
-                    setText(hiddenID, textStatus);
+            if(newID) {
+                queueLookup(hiddenID, url, newID);
+            }
+        });
+    }
+
+
+    // Options which apply to all widgets. Change them before the widgets
+    // are activated, e.g. SimpleSelect.settings.debounce = 150;
+    var settings = {
+        // milliseconds without typing before a search is sent
+        debounce: 300,
+
+        // how many searches to remember for each field
+        cacheSize: 100,
+
+        // activate widgets when they come near the viewport or get focus,
+        // rather than all of them when the page is ready
+        lazy: true,
+
+        // how close to the viewport a widget has to come to be activated
+        lazyMargin: '200px'
+    };
+
+
+    /**
+     * A map which forgets its least recently used keys beyond `size`.
+     */
+    function LRUCache(size) {
+        this.size = size;
+        this.keys = [];  // least recently used first
+        this.values = {};
+    }
+
+    LRUCache.prototype.touch = function(key) {
+        var i = $.inArray(key, this.keys);
+        if(i >= 0) {
+            this.keys.splice(i, 1);
+        }
+        this.keys.push(key);
+    };
+
+    LRUCache.prototype.get = function(key) {
+        if(!this.values.hasOwnProperty(key)) {
+            return undefined;
+        }
+        this.touch(key);
+        return this.values[key];
+    };
+
+    LRUCache.prototype.set = function(key, value) {
+        this.values[key] = value;
+        this.touch(key);
+        while(this.keys.length > this.size) {
+            delete this.values[this.keys.shift()];
+        }
+    };
+
+    /**
+     * Call func(key, value) for each entry, most recently used first, until
+     * it returns false.
+     */
+    LRUCache.prototype.each = function(func) {
+        for(var i = this.keys.length - 1; i >= 0; i--) {
+            if(func(this.keys[i], this.values[this.keys[i]]) === false) {
+                return;
+            }
+        }
+    };
+
+
+    // Search responses by term, one LRUCache per field URL, so all widgets
+    // of a field (e.g. in a formset) share them
+    var resultCaches = {};
+
+
+    function getResultCache(url) {
+        if(!resultCaches.hasOwnProperty(url)) {
+            resultCaches[url] = new LRUCache(settings.cacheSize);
+        }
+        return resultCaches[url];
+    }
+
+
+    /**
+     * Split a search into lowercase terms, the way the server does.
+     */
+    function splitTerms(query) {
+        return $.trim(query.toLowerCase()).split(/\s+/);
+    }
+
+
+    /**
+     * Drop the terms the server ignores for a field: those shorter than
+     * `options.minLength` and those in `options.stopTerms`.
+     */
+    function usableTerms(terms, options) {
+        return $.grep(terms, function(term) {
+            return term.length >= options.minLength &&
+                $.inArray(term, options.stopTerms) < 0;
+        });
+    }
+
+
+    /**
+     * Check whether every result for `narrowTerms` must also be a result for
+     * `broadTerms`: that is the case if each broad term is part of some
+     * narrow term.
+     */
+    function isRefinement(narrowTerms, broadTerms) {
+        return $.grep(broadTerms, function(broad) {
+            return !$.grep(narrowTerms, function(narrow) {
+                return narrow.indexOf(broad) >= 0;
+            }).length;
+        }).length === 0;
+    }
+
+
+    /**
+     * Try to answer a search without asking the server.
+     *
+     * Either the same search was made before, or a broader one was made whose
+     * response had every result (`more` was false); then its results are
+     * filtered down by label, the way selectize filters them anyway.
+     *
+     * Returns a list of results, or null.
+     */
+    function findCachedResults(cache, query, options) {
+        var hit = cache.get(query);
+        if(hit !== undefined) {
+            return hit.results;
+        }
+
+        var terms = usableTerms(splitTerms(query), options);
+        var found = null;
+        cache.each(function(key, response) {
+            if(!response.more &&
+               isRefinement(terms, usableTerms(splitTerms(key), options))) {
+                found = filterByLabel(response.results, terms);
+                return false;
+            }
+        });
+        return found;
+    }
+
+
+    /**
+     * Get the results whose labels contain all of `terms`.
+     */
+    function filterByLabel(results, terms) {
+        return $.grep(results, function(item) {
+            var label = String(item.label).toLowerCase();
+            return !$.grep(terms, function(term) {
+                return label.indexOf(term) < 0;
+            }).length;
+        });
+    }
+
+
+    // Promises of the choices in each bundle, by bundle URL
+    var bundles = {};
+
+
+    /**
+     * Fetch a bundle of all choices of a field, once per page.
+     *
+     * Returns a promise of a list of {pk, label} results.
+     */
+    function getBundle(url) {
+        if(!bundles.hasOwnProperty(url)) {
+            var deferred = $.Deferred();
+            bundles[url] = deferred.promise();
+            $.ajax({
+                url: url,
+                type: 'GET',
+                cache: true,
+                error: function() {
+                    // try again with the next search
+                    delete bundles[url];
+                    deferred.reject();
+                },
+                success: function(res) {
+                    deferred.resolve($.map(res.results, function(pair) {
+                        return {pk: pair[0], label: pair[1]};
+                    }));
                 }
             });
-        });
+        }
+        return bundles[url];
+    }
+
+
+    /**
+     * Make a selectize `load` callback which searches a bundle of all of a
+     * field's choices, without asking the server.
+     */
+    function makeBundleLoader(url, options) {
+        return function(query, callback) {
+            var terms = usableTerms(splitTerms(query), options);
+            if(!terms.length) {
+                return callback();
+            }
+            getBundle(url).then(function(results) {
+                callback(filterByLabel(results, terms));
+            }, function() {
+                callback();
+            });
+        };
+    }
+
+
+    /**
+     * Make a selectize `load` callback which searches `url`.
+     *
+     * Answers are taken from the field's cache when possible. A search which
+     * is still running when the next one starts is aborted, and one without
+     * any usable terms (see `usableTerms`) isn't sent at all.
+     */
+    function makeLoader(url, options) {
+        var cache = getResultCache(url);
+        var request = null;
+
+        return function(query, callback) {
+            if(!usableTerms(splitTerms(query), options).length) {
+                return callback();
+            }
+
+            var cached = findCachedResults(cache, query, options);
+            if(cached !== null) {
+                return callback(cached);
+            }
+
+            if(request) {
+                request.abort();
+            }
+            request = $.ajax({
+                url: url + "&term=" + encodeURIComponent(query),
+                type: 'GET',
+                error: function() {
+                    callback();
+                },
+                success: function(res) {
+                    if(!res.too_broad) {
+                        cache.set(query, res);
+                    }
+                    callback(res.results);
+                },
+                complete: function(jqXHR) {
+                    if(request === jqXHR) {
+                        request = null;
+                    }
+                }
+            });
+        };
     }
 
 
@@ -115,6 +457,11 @@ var SimpleSelect = (function($) {
      */
     function $makeTextInput(hiddenID) {
         var textfieldID = hiddenID + '_text'
+        var $existing = $("#" + textfieldID);
+        if($existing.length) {
+            // made by activateLazily
+            return $existing;
+        }
         var $textElem = $('<input>', {type: 'text', id: textfieldID,
                                       "class": "simpleselect-search"});
         $("#" + hiddenID).after($textElem);
@@ -125,47 +472,140 @@ var SimpleSelect = (function($) {
     /**
      * Inject an autocompleting textbox next to an <input hidden>
      *
-     * This is meant to be called by JS code that is put in the
-     * template automatically by the Python AutocompleteWidget class.
-     *
      * Parameters
      * hiddenID (string): the ID of a hidden input
      * url (string): a service that gives autocomplete suggestions for
      *               this field
      *
+     * Activating a widget a second time does nothing.
+     *
      * Doesn't return anything.
      */
-    return {
-        activateWidget: function(hiddenID, url) {
-            var $textfield = $makeTextInput(hiddenID);
-            $textfield.selectize({
-                valueField: 'pk',
-                labelField: 'label',
-                searchField: 'label',
-                create: false,
-                maxItems: 1,
-                load: function(query, callback) {
-                    if(!query.length) return callback;
-                    $.ajax({
-                        url: url + "&term=" + encodeURIComponent(query),
-                        type: 'GET',
-                        error: function() {
-                            callback();
-                        },
-                        success: function(res) {
-                            callback(res);
-                        }
-                    })
-                }
-            });
+    function activateWidget(hiddenID, url) {
+        var $hiddenElem = $("#"+hiddenID);
+        if($hiddenElem.data("simpleselectActive")) {
+            return;
+        }
+        $hiddenElem.data("simpleselectActive", true);
+
+        var options = {
+            minLength: parseInt(
+                $hiddenElem.attr("data-simpleselect-min-length"), 10) || 1,
+            stopTerms: splitTerms(
+                $hiddenElem.attr("data-simpleselect-stop-terms") || "")
+        };
+        var bundleURL = $hiddenElem.attr("data-simpleselect-bundle");
+        // a placeholder's label would become an option of its own
+        var $textfield = $makeTextInput(hiddenID).val("");
+        $textfield.selectize({
+            valueField: 'pk',
+            labelField: 'label',
+            searchField: 'label',
+            create: false,
+            maxItems: 1,
+            loadThrottle: settings.debounce,
+            load: (bundleURL ? makeBundleLoader(bundleURL, options)
+                   : makeLoader(url, options))
+        });
+
+        updateOnChange(hiddenID, url);
+        var value = $hiddenElem.val();
+        var label = $hiddenElem.attr("data-simpleselect-label");
+
+        // if there's an initial value, show its text: either it was put
+        // in the markup by the server, or it's loaded (the lookups of
+        // all widgets on the page go out in one request). A placeholder's
+        // lookup may still be on its way; showLabel handles its answer.
+        if(value && label !== undefined) {
+            setText(hiddenID, {pk: value, label: label});
+        } else if(value && !$hiddenElem.data("simpleselectLabelPending")) {
+            $hiddenElem.trigger('change');
+        }
+    }
 
-            updateOnChange(hiddenID, url);
-            var $hiddenElem = $("#"+hiddenID);
 
-            // if there's an initial value, load the text for it
-            if($hiddenElem.val()) {
-                $hiddenElem.trigger('change');
+    // Watches the placeholders of widgets waiting to be activated; made when
+    // it's first needed
+    var observer = null;
+
+
+    function getObserver() {
+        if(observer === null) {
+            observer = new IntersectionObserver(function(entries) {
+                $.each(entries, function(i, entry) {
+                    if(entry.isIntersecting) {
+                        $(entry.target).data("simpleselectActivate")(false);
+                    }
+                });
+            }, {rootMargin: settings.lazyMargin});
+        }
+        return observer;
+    }
+
+
+    /**
+     * Activate the widget of the <input hidden> element `hidden` once it
+     * comes near the viewport or gets focus.
+     *
+     * Until then it only has a plain text input showing its label, which is
+     * cheap to make; selectize and the event handlers wait. A label the
+     * server didn't render is requested right away, in one batch with all
+     * the others. Without IntersectionObserver (or with `settings.lazy` off)
+     * the widget is activated right away.
+     */
+    function activateLazily(hidden) {
+        var $hidden = $(hidden);
+        var hiddenID = hidden.id;
+        var url = $hidden.attr("data-simpleselect-url");
+        if($hidden.data("simpleselectActive") ||
+           $("#" + hiddenID + "_text").length) {
+            return;
+        }
+        if(!settings.lazy || typeof IntersectionObserver === "undefined") {
+            return activateWidget(hiddenID, url);
+        }
+
+        var $placeholder = $makeTextInput(hiddenID)
+            .val($hidden.attr("data-simpleselect-label") || "");
+        if($hidden.val() &&
+           $hidden.attr("data-simpleselect-label") === undefined) {
+            // the server didn't render the label; ask for it now, together
+            // with those of all other widgets on the page
+            $hidden.data("simpleselectLabelPending", true);
+            queueLookup(hiddenID, url, $hidden.val());
+        }
+        var activate = function(focus) {
+            getObserver().unobserve($placeholder[0]);
+            $placeholder.off("focus.simpleselect");
+            activateWidget(hiddenID, url);
+            if(focus) {
+                $placeholder[0].selectize.focus();
             }
+        };
+        $placeholder.data("simpleselectActivate", activate);
+        $placeholder.one("focus.simpleselect", function() {
+            activate(true);
+        });
+        getObserver().observe($placeholder[0]);
+    }
+
+
+    return {
+        settings: settings,
+
+        activateWidget: activateWidget,
+
+        /**
+         * Activate, lazily, every widget rendered inside `container` (by
+         * default the whole document). Call this after adding forms to a
+         * page, e.g. for a formset's "add another" button.
+         */
+        activateAll: function(container) {
+            $(container || document)
+                .find("input.simpleselect[data-simpleselect-url]")
+                .each(function() {
+                    activateLazily(this);
+                });
         }
     }
 
@@ -173,8 +613,10 @@ var SimpleSelect = (function($) {
 
 
 jQuery(function() {
+   // widgets rendered with an activation script are activated right away
    window.SIMPLESELECT_ACTIVATORS = window.SIMPLESELECT_ACTIVATORS || [];
    jQuery.each(window.SIMPLESELECT_ACTIVATORS, function(i, activator) {
        activator();
    });
+   SimpleSelect.activateAll();
 });
@@ -0,0 +1,196 @@
+"""Per-field request statistics.
+
+With the ``SIMPLESELECT_STATS`` setting on, every autocomplete request is
+measured and :py:data:`simpleselect.signals.request_measured` is sent. The
+receiver in this module adds each measurement to counters in the cache named
+by ``SIMPLESELECT_CACHE``, so they're shared by all processes. Read them with
+:py:func:`get_stats`, the ``simpleselect_stats`` management command or
+:py:func:`simpleselect.views.stats_view`.
+
+"""
+import django.conf
+import django.db
+
+from . import signals
+from .cache import FOREVER
+from .cache import get_cache
+from .fields import get_qualname
+
+#: Upper bounds, in milliseconds, of the latency histogram's buckets. Slower
+#: requests go in one more, unbounded bucket.
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000)
+
+COUNTERS = (['requests', 'duration_us', 'queries', 'rows', 'cache_hits',
+             'cache_lookups'] +
+            ['latency_{}'.format(i) for i in range(len(LATENCY_BUCKETS) + 1)])
+
+
+def is_enabled():
+    """Check the ``SIMPLESELECT_STATS`` setting."""
+    return getattr(django.conf.settings, 'SIMPLESELECT_STATS', False)
+
+
+def note(request, **values):
+    """Tell the measurement of ``request`` about its results, e.g.
+    ``rows=10``. Does nothing if the request isn't being measured."""
+    getattr(request, 'simpleselect_stats', {}).update(values)
+
+
+def get_debug_attribute(connection):
+    """Get the name of the attribute forcing ``connection`` to log queries,
+    which was renamed in Django 1.8."""
+    if hasattr(connection, 'force_debug_cursor'):
+        return 'force_debug_cursor'
+    return 'use_debug_cursor'
+
+
+def count_logged_queries(connection):
+    """Get the number of queries ``connection`` has logged so far."""
+    if hasattr(connection, 'queries_log'):
+        return len(connection.queries_log)
+    return len(connection.queries)
+
+
+class QueryCounter(object):
+    """Count the queries run on all database connections in a ``with``
+    block.
+
+    Django only logs queries in ``DEBUG`` mode, so logging is forced on for
+    the duration of the block.
+
+    """
+
+    def __enter__(self):
+        self.connections = django.db.connections.all()
+        self.saved = []
+        self.start = []
+        for connection in self.connections:
+            attribute = get_debug_attribute(connection)
+            self.saved.append(getattr(connection, attribute))
+            setattr(connection, attribute, True)
+            self.start.append(count_logged_queries(connection))
+        self.count = 0
+        return self
+
+    def __exit__(self, *exc_info):
+        for connection, saved, start in zip(self.connections, self.saved,
+                                            self.start):
+            self.count += count_logged_queries(connection) - start
+            setattr(connection, get_debug_attribute(connection), saved)
+
+
+def get_bucket(duration):
+    """Get the index of the histogram bucket for a duration in seconds.
+
+    >>> get_bucket(0.007)
+    1
+    >>> get_bucket(3)
+    8
+
+    """
+    ms = duration * 1000
+    for index, bound in enumerate(LATENCY_BUCKETS):
+        if ms <= bound:
+            return index
+    return len(LATENCY_BUCKETS)
+
+
+def get_counter_key(field_key, name):
+    """Get the cache key of one counter of a field."""
+    return 'simpleselect:stats:{}:{}'.format(field_key, name)
+
+
+def increment(key, delta, cache):
+    """Add ``delta`` to a counter, creating it if needed."""
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, FOREVER):
+            cache.incr(key, delta)
+
+
+def record(sender, fields, duration, queries, rows, cache_hit, **kwargs):
+    """Signal receiver adding a measurement to the counters of its fields.
+
+    A batched lookup counts once for every field in it.
+
+    """
+    values = {
+        'requests': 1,
+        'duration_us': int(duration * 1e6),
+        'queries': queries,
+        'rows': rows or 0,
+        'latency_{}'.format(get_bucket(duration)): 1,
+    }
+    if cache_hit is not None:
+        values['cache_lookups'] = 1
+        values['cache_hits'] = int(cache_hit)
+
+    cache = get_cache()
+    for field in fields:
+        field_key = field.registry_key_func()
+        for name, delta in values.items():
+            if delta:
+                increment(get_counter_key(field_key, name), delta, cache)
+
+
+signals.request_measured.connect(record,
+                                 dispatch_uid='simpleselect.stats.record')
+
+
+def divide(numerator, denominator):
+    """Divide, or get ``None`` if there's nothing to divide by."""
+    if not denominator:
+        return None
+    return numerator / denominator
+
+
+def get_stats(fields, cache=None):
+    """Read the counters of several fields.
+
+    :type  fields: seq
+    :param fields: AutoSelectField subclasses.
+
+    :rtype: list of dict
+    :returns: For each field, its registry ``key``, ``field`` (its dotted
+              name), the number of ``requests``, their ``total_ms`` and
+              ``mean_ms``, ``queries`` and ``rows`` per request, the
+              ``cache_hit_ratio`` of searches and the ``latency`` histogram
+              as ``[upper bound in ms, requests]`` pairs; the last bound is
+              ``None``.
+
+    """
+    if cache is None:
+        cache = get_cache()
+    field_keys = [field.registry_key_func() for field in fields]
+    found = cache.get_many([get_counter_key(field_key, name)
+                            for field_key in field_keys for name in COUNTERS])
+
+    stats = []
+    for field, field_key in zip(fields, field_keys):
+        counts = {name: found.get(get_counter_key(field_key, name), 0)
+                  for name in COUNTERS}
+        requests = counts['requests']
+        stats.append({
+            'key': field_key,
+            'field': get_qualname(field),
+            'requests': requests,
+            'total_ms': counts['duration_us'] / 1000,
+            'mean_ms': divide(counts['duration_us'] / 1000, requests),
+            'queries': divide(counts['queries'], requests),
+            'rows': divide(counts['rows'], requests),
+            'cache_hit_ratio': divide(counts['cache_hits'],
+                                      counts['cache_lookups']),
+            'latency': [[bound, counts['latency_{}'.format(index)]]
+                        for index, bound
+                        in enumerate(LATENCY_BUCKETS + (None,))],
+        })
+    return stats
+
+
+def reset(fields, cache=None):
+    """Set the counters of ``fields`` back to zero."""
+    if cache is None:
+        cache = get_cache()
+    cache.delete_many([get_counter_key(field.registry_key_func(), name)
+                       for field in fields for name in COUNTERS])
@@ -0,0 +1,130 @@
+"""Cleaning up search terms before they're turned into queries.
+
+Every term becomes one more group of conditions in the search query, so
+repeated terms and terms which can't narrow the results down any further only
+make the query bigger and slower.
+
+"""
+import unicodedata
+
+#: For lookup types where a term can make another one redundant: whether
+#: a value matching ``term`` always matches ``other`` too.
+IMPLIES = {
+    'contains': lambda term, other: other in term,
+    'startswith': lambda term, other: term.startswith(other),
+    'endswith': lambda term, other: term.endswith(other),
+}
+
+
+def is_case_insensitive(lookup):
+    """Check whether a lookup type ignores case.
+
+    >>> is_case_insensitive('iexact'), is_case_insensitive('exact')
+    (True, False)
+
+    """
+    return lookup.startswith('i')
+
+
+def strip_accents(term):
+    """Remove the accents from the letters of a term.
+
+    >>> strip_accents('José Núñez')
+    'Jose Nunez'
+
+    """
+    return ''.join(c for c in unicodedata.normalize('NFKD', term)
+                   if not unicodedata.combining(c))
+
+
+def is_subsumed(term, other, lookups):
+    """Check whether ``term`` is redundant next to ``other``, i.e. whether
+    every value ``other`` matches is also matched by ``term``, for all of the
+    given lookup types.
+
+    >>> is_subsumed('jo', 'john', ['icontains', 'istartswith'])
+    True
+    >>> is_subsumed('jo', 'john', ['icontains', 'iexact'])
+    False
+
+    """
+    for lookup in lookups:
+        a, b = term, other
+        if is_case_insensitive(lookup):
+            lookup = lookup[1:]
+            a, b = a.lower(), b.lower()
+        implies = IMPLIES.get(lookup)
+        if implies is None:
+            if a != b:
+                return False
+        elif not implies(b, a):
+            return False
+    return True
+
+
+def normalize_terms(terms, lookups, accents=False, max_terms=None,
+                    max_length=None, min_length=None, stop_terms=(),
+                    subsume=True):
+    """Clean up search terms.
+
+    In order:
+
+    1. With ``accents`` set, accents are removed.
+    2. If all ``lookups`` ignore case, the terms are lowercased.
+    3. Terms longer than ``max_length`` are cut short.
+    4. Terms shorter than ``min_length`` are dropped, and so are
+       ``stop_terms``, whatever their case.
+    5. Repeated terms are dropped.
+    6. With ``subsume`` set, terms made redundant by another one are
+       dropped, e.g. ``'jo'`` next to ``'john'`` when every lookup is
+       ``icontains``. Turn it off for terms that aren't matched with
+       ``lookups``.
+    7. Only the first ``max_terms`` terms are kept.
+
+    Only steps 1, 3, 4 and 7 can change the results, and the last three only
+    ever give more of them.
+
+    :type  lookups: seq of str
+    :param lookups: The lookup types the terms are used with, e.g.
+                    ``['icontains', 'iexact']``.
+
+    :type  stop_terms: seq of str
+    :param stop_terms: Terms too common to narrow a search down, e.g.
+                       ``['inc', 'ltd']`` for company names.
+
+    :rtype: list of str
+
+    >>> normalize_terms(['John', 'j', 'SMITH', 'john'], ['icontains'])
+    ['john', 'smith']
+
+    """
+    if accents:
+        terms = [strip_accents(term) for term in terms]
+    if all(is_case_insensitive(lookup) for lookup in lookups):
+        terms = [term.lower() for term in terms]
+    if max_length is not None:
+        terms = [term[:max_length] for term in terms]
+    if min_length is not None:
+        terms = [term for term in terms if len(term) >= min_length]
+    if stop_terms:
+        stop_terms = set(term.lower() for term in stop_terms)
+        terms = [term for term in terms if term.lower() not in stop_terms]
+
+    unique = []
+    for term in terms:
+        if term not in unique:
+            unique.append(term)
+
+    # a term can only be made redundant by one at least as long as itself,
+    # so the longest ones are kept first
+    if subsume:
+        kept = []
+        for term in sorted(unique, key=len, reverse=True):
+            if not any(is_subsumed(term, other, lookups) for other in kept):
+                kept.append(term)
+        unique = [term for term in unique if term in kept]
+    terms = unique
+
+    if max_terms is not None:
+        terms = terms[:max_terms]
+    return terms
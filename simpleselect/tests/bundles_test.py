@@ -0,0 +1,74 @@
+import unittest
+from unittest import mock
+
+from .. import bundles
+from .. import cache
+
+
+class GetBundleVersionTest(unittest.TestCase):
+    """Tests for the get_bundle_version() function."""
+
+    def setUp(self):
+        self.field = mock.MagicMock(bundle_max_rows=10, cache_dependencies=())
+        self.field.registry_key_func.return_value = 'abcde'
+        self.field.data.model._meta.app_label = 'app'
+        self.field.data.model._meta.object_name = 'Model'
+        self.cache = cache.LRUCache('', {})
+        patcher = mock.patch.object(cache, 'get_cache',
+                                    return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_not_bundled(self):
+        """Fields without bundle_max_rows are never bundled."""
+        self.field.bundle_max_rows = None
+        self.assertIsNone(bundles.get_bundle_version(self.field))
+        self.assertFalse(self.field.data.count.called)
+
+    def test_small_field(self):
+        """A field with few enough rows gets its data version."""
+        self.field.data.count.return_value = 10
+        self.assertEqual(bundles.get_bundle_version(self.field),
+                         bundles.get_version(self.field))
+
+    def test_large_field(self):
+        """A field with too many rows isn't bundled."""
+        self.field.data.count.return_value = 11
+        self.assertIsNone(bundles.get_bundle_version(self.field))
+
+    def test_counted_once_per_version(self):
+        """The rows are only counted again once the data changes."""
+        self.field.data.count.return_value = 5
+        bundles.get_bundle_version(self.field)
+        bundles.get_bundle_version(self.field)
+        self.assertEqual(self.field.data.count.call_count, 1)
+
+        cache.bump_version(self.field.data.model, self.cache)
+        bundles.get_bundle_version(self.field)
+        self.assertEqual(self.field.data.count.call_count, 2)
+
+
+class MakeBundleTest(unittest.TestCase):
+    """Tests for the make_bundle() function."""
+
+    def test_pairs(self):
+        """Every row becomes a [pk, label] pair."""
+        field = mock.Mock(label_format='{name}', label_related=None)
+        qset = mock.MagicMock(ordered=True)
+        with mock.patch.object(bundles.labels, 'prepare_queryset',
+                               return_value=[{'pk': 1, 'name': 'Acme'},
+                                             {'pk': 2, 'name': 'Initech'}]):
+            self.assertEqual(bundles.make_bundle(field, qset),
+                             [[1, 'Acme'], [2, 'Initech']])
+        self.assertFalse(qset.order_by.called)
+
+    def test_unordered_sorted_by_pk(self):
+        """Unordered data is sorted so the bundle is always the same."""
+        field = mock.Mock(label_format='{name}', label_related=None)
+        qset = mock.MagicMock(ordered=False)
+        with mock.patch.object(bundles.labels, 'prepare_queryset',
+                               return_value=[]) as prepare:
+            bundles.make_bundle(field, qset)
+        qset.order_by.assert_called_once_with('pk')
+        prepare.assert_called_once_with(qset.order_by.return_value, '{name}',
+                                        None)
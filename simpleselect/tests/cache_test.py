@@ -0,0 +1,123 @@
+import unittest
+from unittest import mock
+
+from .. import cache
+
+
+class LRUCacheTest(unittest.TestCase):
+    """Tests for the LRUCache backend."""
+
+    def setUp(self):
+        self.cache = cache.LRUCache('', {'OPTIONS': {'MAX_ENTRIES': 2}})
+
+    def test_get_and_set(self):
+        """Stored values can be read back."""
+        self.cache.set('a', 1)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+
+    def test_evicts_least_recently_used(self):
+        """A key that was read recently survives eviction."""
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+
+    def test_add_keeps_existing(self):
+        """add() doesn't overwrite an existing key."""
+        self.assertTrue(self.cache.add('a', 1))
+        self.assertFalse(self.cache.add('a', 2))
+        self.assertEqual(self.cache.get('a'), 1)
+
+    def test_expiry(self):
+        """Values are dropped once their timeout has passed."""
+        with mock.patch.object(cache.time, 'time', return_value=1000):
+            self.cache.set('a', 1, 10)
+        with mock.patch.object(cache.time, 'time', return_value=1011):
+            self.assertIsNone(self.cache.get('a'))
+
+    def test_incr(self):
+        """incr() adds to a stored number."""
+        self.cache.set('a', 1)
+        self.assertEqual(self.cache.incr('a', 2), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+
+class VersionTest(unittest.TestCase):
+    """Tests for the data version functions."""
+
+    def setUp(self):
+        self.cache = cache.LRUCache('', {})
+        self.model = mock.MagicMock()
+        self.model._meta.app_label = 'app'
+        self.model._meta.object_name = 'Model'
+
+    def test_read_version_watched(self):
+        """Reading a model's version makes this process bump it too."""
+        with mock.patch.object(cache, 'watch') as watch:
+            cache.get_versions([self.model], self.cache)
+        watch.assert_called_once_with(self.model)
+
+    def test_version_created_once(self):
+        """A model's version stays the same until it is bumped."""
+        first = cache.get_versions([self.model], self.cache)
+        self.assertEqual(cache.get_versions([self.model], self.cache), first)
+
+    def test_bump_changes_version(self):
+        """Bumping always gives a larger version, even within 1ms."""
+        with mock.patch.object(cache, 'now_ms', return_value=5):
+            old, = cache.get_versions([self.model], self.cache)
+            cache.bump_version(self.model, self.cache)
+            new, = cache.get_versions([self.model], self.cache)
+        self.assertGreater(new, old)
+
+    def test_version_outlives_default_timeout(self):
+        """Versions don't expire with the cache's default timeout."""
+        with mock.patch.object(cache.time, 'time', return_value=1000):
+            first = cache.get_versions([self.model], self.cache)
+        with mock.patch.object(cache.time, 'time',
+                               return_value=1000 + 10 ** 6):
+            self.assertEqual(cache.get_versions([self.model], self.cache),
+                             first)
+
+
+class GetVersionCacheTest(unittest.TestCase):
+    """Tests for the get_version_cache() function."""
+
+    def setUp(self):
+        patcher = mock.patch.object(cache, 'WARNED_ALIASES', set())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_local_cache_warned_once(self):
+        """A cache local to the process is warned about, once."""
+        local = cache.LRUCache('', {})
+        with mock.patch.object(cache, 'get_cache', return_value=local), \
+                mock.patch.object(cache, 'logger') as logger:
+            self.assertIs(cache.get_version_cache(), local)
+            cache.get_version_cache()
+        self.assertEqual(logger.warning.call_count, 1)
+
+    def test_shared_cache(self):
+        """Other caches are used without a warning."""
+        shared = mock.Mock()
+        with mock.patch.object(cache, 'get_cache', return_value=shared), \
+                mock.patch.object(cache, 'logger') as logger:
+            self.assertIs(cache.get_version_cache(), shared)
+        self.assertFalse(logger.warning.called)
+
+
+class GetOrSetTest(unittest.TestCase):
+    """Tests for the get_or_set() function."""
+
+    def test_producer_called_on_miss_only(self):
+        """The producer runs once; the second call is a cache hit."""
+        backend = cache.LRUCache('', {})
+        producer = mock.MagicMock(return_value={'results': []})
+        cache.get_or_set('k', producer, 60, backend)
+        self.assertEqual(cache.get_or_set('k', producer, 60, backend),
+                         {'results': []})
+        self.assertEqual(producer.call_count, 1)
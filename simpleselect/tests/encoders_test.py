@@ -0,0 +1,42 @@
+import unittest
+from unittest import mock
+
+import django.core.exceptions
+
+from .. import encoders
+
+
+class FindEncoderTest(unittest.TestCase):
+    """Tests for the find_encoder() function."""
+
+    def test_json_gives_bytes(self):
+        """The standard library encoder returns compact bytes."""
+        encoder = encoders.find_encoder('json')
+        self.assertEqual(encoder({'a': [1, None]}), b'{"a":[1,null]}')
+
+    def test_auto_prefers_installed_library(self):
+        """'auto' picks the first installed library."""
+        with mock.patch.object(encoders, 'LIBRARIES',
+                               [('orjson', None), ('ujson', mock.sentinel)]):
+            self.assertIs(encoders.find_encoder('auto'), encoders.ujson_dumps)
+
+    def test_auto_falls_back_to_json(self):
+        """Without any fast library 'auto' uses the standard library."""
+        with mock.patch.object(encoders, 'LIBRARIES', [('orjson', None)]):
+            self.assertIs(encoders.find_encoder('auto'), encoders.json_dumps)
+
+    def test_missing_library_refused(self):
+        """Naming a library which isn't installed is a configuration error."""
+        with mock.patch.object(encoders, 'LIBRARIES', [('orjson', None)]):
+            with self.assertRaises(
+                    django.core.exceptions.ImproperlyConfigured):
+                encoders.find_encoder('orjson')
+
+    def test_dotted_path(self):
+        """Other names are imported."""
+        self.assertIs(encoders.find_encoder('json.dumps'),
+                      encoders.json.dumps)
+
+    def test_callable(self):
+        """A callable is used as it is."""
+        self.assertIs(encoders.find_encoder(len), len)
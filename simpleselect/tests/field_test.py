@@ -17,3 +17,107 @@ class AutoSelectFieldTest(unittest.TestCase):
             class MyField(fields.AutoSelectField):
                 pass
         self.assertTrue(registry)
+
+
+class RegisterTest(unittest.TestCase):
+    """Tests for the register() function."""
+
+    def setUp(self):
+        self.registry = {}
+        patcher = mock.patch.object(fields, 'REGISTRY', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_field(self, name, **attrs):
+        attrs['__module__'] = __name__
+        return type(name, (fields.AutoSelectField,), attrs)
+
+    def test_key_cached(self):
+        """The key is computed once, when the class is made."""
+        field = self.make_field('MyField')
+        with mock.patch.object(fields, 'sha1') as sha1:
+            key = field.registry_key_func()
+        self.assertFalse(sha1.called)
+        self.assertIs(self.registry[key], field)
+        self.assertEqual(len(key), fields.KEY_LENGTH)
+
+    def test_collision(self):
+        """A class colliding with a registered one gets a longer key, and
+        the registered one keeps its own."""
+        with mock.patch.object(fields, 'sha1', return_value='abcdefgh'), \
+                mock.patch.object(fields, 'logger') as logger:
+            first = self.make_field('B')
+            second = self.make_field('A')
+        self.assertEqual(first.registry_key_func(), 'abcde')
+        self.assertEqual(second.registry_key_func(), 'abcdef')
+        self.assertEqual(self.registry, {'abcde': first, 'abcdef': second})
+        self.assertTrue(logger.warning.called)
+
+    def test_redefinition_replaces(self):
+        """A class with the same dotted name takes over the old one's key."""
+        old = self.make_field('MyField')
+        new = self.make_field('MyField')
+        self.assertEqual(old.registry_key_func(), new.registry_key_func())
+        self.assertEqual(list(self.registry.values()), [new])
+
+    def test_explicit_key(self):
+        """A class can ask for a short key, which isn't inherited."""
+        field = self.make_field('MyField', registry_key=1)
+        child = type('Child', (field,), {'__module__': __name__})
+        self.assertEqual(field.registry_key_func(), '1')
+        self.assertIs(self.registry['1'], field)
+        self.assertEqual(len(child.registry_key_func()), fields.KEY_LENGTH)
+
+    def test_explicit_key_from_settings(self):
+        """Keys can be given in the SIMPLESELECT_REGISTRY_KEYS setting."""
+        qualname = __name__ + '.MyField'
+        with mock.patch.object(fields.django.conf, 'settings', mock.Mock(
+                SIMPLESELECT_REGISTRY_KEYS={qualname: 'p'})):
+            field = self.make_field('MyField')
+        self.assertEqual(field.registry_key_func(), 'p')
+
+    def test_explicit_key_taken_by_hash(self):
+        """An explicit key can't take over a registered class's key."""
+        with mock.patch.object(fields, 'sha1', return_value='abcdefgh'):
+            hashed = self.make_field('A')
+            with self.assertRaises(fields.django.core.exceptions
+                                   .ImproperlyConfigured):
+                self.make_field('B', registry_key='abcde')
+        self.assertEqual(hashed.registry_key_func(), 'abcde')
+        self.assertEqual(self.registry, {'abcde': hashed})
+
+    def test_explicit_key_conflict(self):
+        """Two classes can't ask for the same key."""
+        self.make_field('A', registry_key='x')
+        with self.assertRaises(fields.django.core.exceptions
+                               .ImproperlyConfigured):
+            self.make_field('B', registry_key='x')
+
+
+class UsesVersionsTest(unittest.TestCase):
+    """Tests for watching the models of fields which use data versions."""
+
+    def setUp(self):
+        patcher = mock.patch.object(fields, 'REGISTRY', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_field(self, **attrs):
+        attrs.update({'__module__': __name__, 'data': mock.MagicMock()})
+        with mock.patch.object(fields.cache, 'watch') as watch:
+            type('MyField', (fields.AutoSelectField,), attrs)
+        return watch
+
+    def test_plain_field_not_watched(self):
+        """Saves don't cost anything for fields not using versions."""
+        self.assertFalse(self.make_field().called)
+        self.assertFalse(self.make_field(
+            search_backend=mock.Mock(check_versions=False)).called)
+
+    def test_version_features_watched(self):
+        """Caching, HTTP caching, bundles and indexes need versions."""
+        for attrs in ({'cache_timeout': 60}, {'http_max_age': 0},
+                      {'bundle_max_rows': 100},
+                      {'search_backend': mock.Mock(check_versions=True)}):
+            self.assertTrue(self.make_field(**attrs).called, attrs)
+
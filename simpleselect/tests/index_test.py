@@ -0,0 +1,156 @@
+import unittest
+from unittest import mock
+
+from .. import index
+
+
+class TokenIndexTest(unittest.TestCase):
+    """Tests for the TokenIndex class."""
+
+    def setUp(self):
+        self.index = index.TokenIndex([
+            (1, 'John', 'Smith'),
+            (2, 'Johanna', 'Smithers'),
+            (3, 'Bojohn', 'Jones'),
+        ])
+
+    def test_prefix_matches(self):
+        """Words are matched by prefix, not substring."""
+        self.assertEqual(self.index.search(['joh']), {1, 2})
+
+    def test_terms_anded(self):
+        """Every term has to match some column."""
+        self.assertEqual(self.index.search(['joh', 'smithe']), {2})
+        self.assertEqual(self.index.search(['SMI', 'jo']), {1, 2})
+
+    def test_no_terms(self):
+        """Without any words there's nothing to filter by."""
+        self.assertIsNone(self.index.search([]))
+        self.assertIsNone(self.index.search(['--']))
+
+    def test_add_replaces(self):
+        """Adding a row again replaces its old tokens."""
+        self.index.add((1, 'Jim', 'Smith'))
+        self.assertEqual(self.index.search(['joh']), {2})
+        self.assertEqual(self.index.search(['jim']), {1})
+
+    def test_remove(self):
+        """Removed rows are no longer found."""
+        self.index.remove(3)
+        self.index.remove(42)
+        self.assertEqual(self.index.search(['jones']), set())
+
+
+class PrefixIndexTest(unittest.TestCase):
+    """Tests for the PrefixIndex search backend."""
+
+    def setUp(self):
+        self.backend = index.PrefixIndex(max_candidates=1,
+                                         check_versions=False)
+        self.field = mock.MagicMock()
+        self.field.queries = ['name__icontains', 'city__name__istartswith']
+        self.field.registry_key_func.return_value = 'abcde'
+        values_list = self.field.data.values_list
+        values_list.return_value.iterator.return_value = [(1, 'Ann', 'Oslo'),
+                                                          (2, 'Anna', None)]
+        self.qset = mock.MagicMock()
+
+    def test_indexes_query_columns(self):
+        """The index is built from the columns of the field's queries."""
+        with mock.patch.object(self.backend, 'connect'):
+            self.backend.filter(self.field, self.qset, ['ann'])
+        self.field.data.values_list.assert_called_with('pk', 'name',
+                                                       'city__name')
+
+    def test_candidates_passed(self):
+        """The matching primary keys are given to the database."""
+        with mock.patch.object(self.backend, 'connect'):
+            result = self.backend.filter(self.field, self.qset, ['oslo'])
+        self.qset.filter.assert_called_with(pk__in=[1])
+        self.assertIs(result, self.qset.filter.return_value)
+
+    def test_too_many_candidates(self):
+        """Beyond max_candidates matches, the queries are used instead, so
+        no match is dropped."""
+        with mock.patch.object(self.backend, 'connect'), \
+                mock.patch.object(index.views, 'query') as query:
+            result = self.backend.filter(self.field, self.qset, ['ann'])
+        self.assertFalse(self.qset.filter.called)
+        self.assertIs(result, query.return_value)
+        self.assertEqual(query.call_args[0][:3], (self.qset.filter, ['ann'],
+                                                  self.field.queries))
+
+
+class TrigramTableTest(unittest.TestCase):
+    """Tests for the TrigramTable class."""
+
+    def setUp(self):
+        self.table = index.TrigramTable(
+            [(0, 'icontains'), (1, 'icontains'), (2, 'startswith')], [
+                (1, 'John Smith', 'John', 'Smith', 'A1'),
+                (2, 'Bojohn Jones', 'Bojohn', 'Jones', 'B2'),
+                (3, 'Jo Smithers', 'Jo', 'Smithers', 'a3'),
+            ])
+
+    def search(self, *terms):
+        return [choice.pk for choice in self.table.search(terms)]
+
+    def test_substring_match(self):
+        """Terms match anywhere inside a column, ignoring case."""
+        self.assertEqual(self.search('JOHN'), [1, 2])
+
+    def test_terms_anded_queries_ored(self):
+        """Each term must match one of the queries."""
+        self.assertEqual(self.search('jo', 'smith'), [1, 3])
+
+    def test_short_terms_scanned(self):
+        """Terms without a whole trigram are checked against every row."""
+        self.assertEqual(self.search('o'), [1, 2, 3])
+
+    def test_lookup_type_respected(self):
+        """Case sensitive lookups stay case sensitive."""
+        self.assertEqual(self.search('A'), [1])
+
+    def test_no_terms_gives_everything(self):
+        """Without terms every row is returned."""
+        self.assertEqual(self.search(), [1, 2, 3])
+
+    def test_choices_have_labels(self):
+        """Results carry the precomputed label."""
+        self.assertEqual(str(self.table.search(['bojohn'])[0]),
+                         'Bojohn Jones')
+
+    def test_replace_and_remove(self):
+        """Updated rows are found by their new values only."""
+        self.table.add((1, 'Jim Smith', 'Jim', 'Smith', 'A1'))
+        self.table.remove(3)
+        self.assertEqual(self.search('smith'), [1])
+        self.assertEqual(self.search('john'), [2])
+        self.assertEqual(len(self.table), 2)
+        self.assertEqual([row[0] for row in self.table.rows()], [2, 1])
+
+    def test_unsupported_lookup(self):
+        """Lookups which can't be evaluated in Python are refused."""
+        with self.assertRaises(ValueError):
+            index.TrigramTable([(0, 'iregex')])
+
+
+class TrigramIndexTest(unittest.TestCase):
+    """Tests for the TrigramIndex search backend."""
+
+    def test_rows_created_between_queries_skipped(self):
+        """An object the label query finds but the values query didn't is
+        left out instead of breaking the build."""
+        field = mock.MagicMock(queries=['name__icontains'],
+                               label_format='{name}')
+        qset = mock.MagicMock()
+        ordered = qset.order_by.return_value
+        ordered.values_list.return_value.iterator.return_value = [(1, 'Ann')]
+        labelled = mock.MagicMock()
+        labelled.iterator.return_value = [{'pk': 1, 'name': 'Ann'},
+                                          {'pk': 2, 'name': 'Bob'}]
+        with mock.patch.object(index.labels, 'prepare_queryset',
+                               return_value=labelled):
+            rows = list(index.TrigramIndex(check_versions=False)
+                        .get_rows(field, qset))
+        self.assertEqual(rows, [(1, 'Ann', 'Ann')])
@@ -0,0 +1,85 @@
+import unittest
+from unittest import mock
+
+from .. import labels
+
+
+class GetLabelColumnsTest(unittest.TestCase):
+    """Tests for the get_label_columns() function."""
+
+    def test_finds_named_fields(self):
+        """Every named replacement field is a column."""
+        self.assertEqual(labels.get_label_columns('{a} and {b__c}'),
+                         ['a', 'b__c'])
+
+    def test_ignores_format_spec(self):
+        """Conversions and format specs aren't part of the column name."""
+        self.assertEqual(labels.get_label_columns('{a!r:>10}'), ['a'])
+
+    def test_deduplicates(self):
+        """A column used twice is only fetched once."""
+        self.assertEqual(labels.get_label_columns('{a}{a}'), ['a'])
+
+    def test_positional_fields_rejected(self):
+        """values() rows can't fill positional fields."""
+        with self.assertRaises(ValueError):
+            labels.get_label_columns('{} {0}')
+
+
+class PrepareQuerysetTest(unittest.TestCase):
+    """Tests for the prepare_queryset() function."""
+
+    def setUp(self):
+        self.qset = mock.MagicMock()
+        self.qset.query.select_related = False
+
+    def test_format_uses_values(self):
+        """With a label format only the needed columns are selected."""
+        result = labels.prepare_queryset(self.qset, '{name} {city__name}')
+        self.qset.values.assert_called_with('pk', 'name', 'city__name')
+        self.assertIs(result, self.qset.values.return_value)
+
+    def test_explicit_relations_selected(self):
+        """Given relations are passed to select_related."""
+        labels.prepare_queryset(self.qset, label_related=['city'])
+        self.qset.select_related.assert_called_with('city')
+
+    def test_relations_detected(self):
+        """By default all foreign keys are selected."""
+        with mock.patch.object(labels, 'get_related_fields',
+                               return_value=['a', 'b']):
+            labels.prepare_queryset(self.qset)
+        self.qset.select_related.assert_called_with('a', 'b')
+
+    def test_existing_select_related_kept(self):
+        """A QuerySet which already uses select_related is left alone."""
+        self.qset.query.select_related = True
+        self.assertIs(labels.prepare_queryset(self.qset), self.qset)
+
+    def test_empty_relations_disable(self):
+        """An empty sequence of relations means no select_related."""
+        self.assertIs(labels.prepare_queryset(self.qset, label_related=()),
+                      self.qset)
+
+
+class LookupTest(unittest.TestCase):
+    """Tests for the lookup() function."""
+
+    def setUp(self):
+        self.qset = mock.MagicMock()
+        rows = [{'pk': 2, 'name': 'b'}, {'pk': 1, 'name': 'a'}]
+        patcher = mock.patch.object(labels, 'prepare_queryset',
+                                    return_value=rows)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_single_query(self):
+        """All IDs are fetched with one pk__in filter."""
+        labels.lookup(self.qset, [1, '2', '1'], '{name}')
+        self.qset.filter.assert_called_once_with(pk__in=['1', '2'])
+
+    def test_keeps_requested_order(self):
+        """Objects come back in the order their IDs were asked for."""
+        self.assertEqual(labels.lookup(self.qset, ['1', '2', '1', '3'],
+                                       '{name}'),
+                         [labels.Choice(1, 'a'), labels.Choice(2, 'b')])
@@ -0,0 +1,88 @@
+import unittest
+from unittest import mock
+
+import django.core.exceptions
+
+from .. import postgres
+
+
+class BackendTestCase(unittest.TestCase):
+    """Set up a fake field and PostgreSQL connection."""
+
+    def setUp(self):
+        self.field = mock.MagicMock()
+        self.field.queries = ['name__icontains', 'code__iexact']
+        opts = self.field.data.model._meta
+        opts.db_table = 'shop_item'
+        opts.get_field.side_effect = lambda name: mock.Mock(column=name)
+
+        self.connection = mock.MagicMock()
+        self.connection.vendor = 'postgresql'
+        self.connection.ops.quote_name = lambda name: '"{}"'.format(name)
+        patcher = mock.patch.object(postgres.django.db, 'connections',
+                                    mock.MagicMock())
+        connections = patcher.start()
+        connections.__getitem__.return_value = self.connection
+        self.addCleanup(patcher.stop)
+
+        self.qset = mock.MagicMock()
+        self.qset.model._meta.pk.name = 'id'
+
+
+class TrigramSearchTest(BackendTestCase):
+    """Tests for the TrigramSearch backend."""
+
+    def test_filter_uses_ilike(self):
+        """Each term is an OR of ILIKEs over the columns, ranked."""
+        postgres.TrigramSearch().filter(self.field, self.qset, ['a_b', 'c'])
+        kwargs = self.qset.extra.call_args[1]
+        self.assertEqual(kwargs['where'], [
+            '("shop_item"."name" ILIKE %s OR "shop_item"."code" ILIKE %s)',
+            '("shop_item"."name" ILIKE %s OR "shop_item"."code" ILIKE %s)',
+        ])
+        self.assertEqual(kwargs['params'],
+                         ['%a\\_b%', '%a\\_b%', '%c%', '%c%'])
+        self.assertEqual(kwargs['order_by'], ['-simpleselect_rank', 'id'])
+
+    def test_other_databases_refused(self):
+        """Using the backend on another database is an error."""
+        self.connection.vendor = 'sqlite'
+        with self.assertRaises(django.core.exceptions.ImproperlyConfigured):
+            postgres.TrigramSearch().filter(self.field, self.qset, ['a'])
+
+    def test_related_columns_refused(self):
+        """Columns of other models can't be searched."""
+        self.field.queries = ['maker__name__icontains']
+        with self.assertRaises(django.core.exceptions.ImproperlyConfigured):
+            postgres.TrigramSearch().filter(self.field, self.qset, ['a'])
+
+    def test_index_per_column(self):
+        """Every searched column gets a trigram index."""
+        statements = postgres.TrigramSearch().get_index_sql(self.field,
+                                                            self.connection)
+        self.assertEqual(len(statements), 3)
+        self.assertIn('USING gin ("code" gin_trgm_ops)', statements[2])
+
+
+class FullTextSearchTest(BackendTestCase):
+    """Tests for the FullTextSearch backend."""
+
+    def test_filter_matches_index(self):
+        """The searched expression is the indexed one."""
+        backend = postgres.FullTextSearch('english')
+        backend.filter(self.field, self.qset, ['jo'])
+        index_sql, = backend.get_index_sql(self.field, self.connection)
+        vector = backend.get_vector_sql(self.field, self.connection)
+        self.assertIn(vector, self.qset.extra.call_args[1]['where'][0])
+        self.assertIn(vector, index_sql)
+
+    def test_no_words(self):
+        """Terms without words don't filter anything."""
+        backend = postgres.FullTextSearch()
+        self.assertIs(backend.filter(self.field, self.qset, ['--']),
+                      self.qset)
+
+    def test_config_checked(self):
+        """The configuration name is put in SQL, so it must be a name."""
+        with self.assertRaises(ValueError):
+            postgres.FullTextSearch("english'); --")
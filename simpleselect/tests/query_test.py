@@ -1,6 +1,9 @@
+import json
 import unittest
 from unittest import mock
 
+from .. import index
+from .. import labels
 from .. import views
 
 
@@ -122,3 +125,372 @@ class QueryTest(unittest.TestCase):
         """query_factory_applier is given the appropriate arguments"""
         self.applier.assert_called_with(['sample_term'], ['sample_query'],
                                         self.Q)
+
+
+class PaginateTest(unittest.TestCase):
+    """Tests for the paginate() function."""
+
+    def test_fetches_one_extra_row(self):
+        """The sequence is sliced one past the limit to look for more rows."""
+        objects = mock.MagicMock()
+        objects.__getitem__.return_value = []
+        views.paginate(objects, 40, 20)
+        objects.__getitem__.assert_called_with(slice(40, 61))
+
+    def test_more_when_extra_row_present(self):
+        """If the extra row exists it's dropped and `more` is True."""
+        rows, more = views.paginate(list(range(5)), 0, 4)
+        self.assertEqual(rows, [0, 1, 2, 3])
+        self.assertTrue(more)
+
+    def test_no_limit(self):
+        """A limit of None returns everything after the offset."""
+        self.assertEqual(views.paginate(list(range(5)), 3, None),
+                         ([3, 4], False))
+
+
+class GetOffsetTest(unittest.TestCase):
+    """Tests for the get_offset() function."""
+
+    def test_defaults_to_start(self):
+        """Without paging parameters the first page is returned."""
+        self.assertEqual(views.get_offset({}, 20), 0)
+
+    def test_page_is_one_based(self):
+        """Page 3 starts after two full pages."""
+        self.assertEqual(views.get_offset({'page': '3'}, 20), 40)
+
+    def test_cursor_wins_over_page(self):
+        """An explicit cursor is used as the offset as-is."""
+        self.assertEqual(views.get_offset({'page': '3', 'cursor': '7'}, 20), 7)
+
+    def test_bad_values_ignored(self):
+        """Garbage and negative values fall back to the first page."""
+        self.assertEqual(views.get_offset({'page': '-2'}, 20), 0)
+        self.assertEqual(views.get_offset({'cursor': 'abc'}, 20), 0)
+
+
+class GetItemsTest(unittest.TestCase):
+    """Tests for the get_items() function."""
+
+    def test_serializes_lookup(self):
+        """The looked up choices are serialized in order."""
+        field = mock.MagicMock(database=None)
+        choices = [labels.Choice(2, 'b'), labels.Choice(1, 'a')]
+        with mock.patch.object(labels, 'lookup',
+                               return_value=choices) as lookup:
+            result = views.get_items(field, ['2', '1'])
+        lookup.assert_called_with(field.data, ['2', '1'], field.label_format,
+                                  field.label_related)
+        self.assertEqual(result, [{'pk': 2, 'label': 'b'},
+                                  {'pk': 1, 'label': 'a'}])
+
+    def test_replica_fallback(self):
+        """IDs missing from a replica are looked up in the primary."""
+        field = mock.MagicMock(database='replica')
+        replica = field.data.using.return_value
+        replica.db = 'replica'
+        field.data.db = 'default'
+
+        def lookup(qset, ids, label_format, label_related):
+            found = {'1': 'a'} if qset is replica else {'2': 'b', '1': 'x'}
+            return [labels.Choice(int(id), found[id])
+                    for id in ids if id in found]
+
+        with mock.patch.object(labels, 'lookup', side_effect=lookup):
+            result = views.get_items(field, ['2', '1', '3'])
+        field.data.using.assert_called_with('replica')
+        self.assertEqual(result, [{'pk': 2, 'label': 'b'},
+                                  {'pk': 1, 'label': 'a'}])
+
+
+class StreamingJSONResponseTest(unittest.TestCase):
+    """Tests for the StreamingJSONResponse class."""
+
+    def get_body(self, rows, **kwargs):
+        resp = views.StreamingJSONResponse(rows, lambda row: row, **kwargs)
+        return json.loads(b''.join(resp.streaming_content).decode('utf-8'))
+
+    def test_sets_content_type(self):
+        """Streamed responses are JSON too."""
+        resp = views.StreamingJSONResponse([], str)
+        self.assertEqual(resp['content-type'], 'application/json')
+
+    def test_encodes_all_rows(self):
+        """Rows are encoded across chunk boundaries."""
+        body = self.get_body(range(7), chunk_size=3)
+        self.assertEqual(body, {'results': list(range(7)), 'more': False,
+                                'cursor': None})
+
+    def test_limit_sets_more(self):
+        """A row past the limit isn't sent but gives a cursor."""
+        body = self.get_body(iter(range(3)), offset=10, limit=2)
+        self.assertEqual(body, {'results': [0, 1], 'more': True,
+                                'cursor': 12})
+
+    def test_empty(self):
+        """No rows give an empty list."""
+        self.assertEqual(self.get_body([])['results'], [])
+
+
+class RankObjectsTest(unittest.TestCase):
+    """Tests for the rank_objects() function."""
+
+    def setUp(self):
+        self.field = mock.MagicMock()
+        self.field.queries = ['name__icontains', 'maker__name__icontains']
+        self.field.data.model._meta.db_table = 'item'
+        self.field.data.model._meta.get_field.side_effect = \
+            lambda name: mock.Mock(column=name)
+
+        connection = mock.MagicMock()
+        connection.ops.quote_name = lambda name: name
+        connection.ops.lookup_cast = lambda lookup: 'UPPER(%s)'
+        connection.ops.prep_for_iexact_query = lambda term: term
+        connection.ops.prep_for_like_query = lambda term: term
+        connection.operators = {'iexact': '= UPPER(%s)',
+                                'istartswith': 'LIKE UPPER(%s)'}
+        patcher = mock.patch.object(views.django.db, 'connections',
+                                    mock.MagicMock())
+        patcher.start().__getitem__.return_value = connection
+        self.addCleanup(patcher.stop)
+
+        self.qset = mock.MagicMock()
+        self.qset.model._meta.pk.name = 'id'
+
+    def test_scores_added_up(self):
+        """Each term adds 3 for equality, 2 for a prefix, else 1."""
+        views.rank_objects(self.field, self.qset, ['a', 'b'])
+        case = ('CASE WHEN UPPER(item.name) = UPPER(%s) THEN 3 '
+                'WHEN UPPER(item.name) LIKE UPPER(%s) THEN 2 ELSE 1 END')
+        self.qset.extra.assert_called_with(
+            select={'simpleselect_rank': case + ' + ' + case},
+            select_params=['a', 'a%', 'b', 'b%'],
+            order_by=['-simpleselect_rank', 'id'])
+
+    def test_nothing_to_rank(self):
+        """Without terms the QuerySet is left alone."""
+        self.assertIs(views.rank_objects(self.field, self.qset, []),
+                      self.qset)
+
+
+class GetBatchItemsTest(unittest.TestCase):
+    """Tests for the get_batch_items() function."""
+
+    def setUp(self):
+        self.fields = {'a': mock.Mock(), 'b': mock.Mock()}
+        patchers = [
+            mock.patch.object(views, 'get_field', self.fields.__getitem__),
+            mock.patch.object(views, 'get_items',
+                              lambda field, ids: [field, ids]),
+            mock.patch.object(views.django.db, 'connections'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_serial(self):
+        """With one worker, every field is looked up in turn."""
+        result = views.get_batch_items({'a': ['1'], 'b': ['2']})
+        self.assertEqual(result, {'a': [self.fields['a'], ['1']],
+                                  'b': [self.fields['b'], ['2']]})
+        self.assertFalse(views.django.db.connections.all.called)
+
+    def test_parallel(self):
+        """With more workers, obsolete thread connections are closed before
+        each lookup."""
+        connection = mock.Mock()
+        views.django.db.connections.all.return_value = [connection]
+        result = views.get_batch_items({'a': ['1'], 'b': ['2']}, workers=4)
+        self.assertEqual(result, {'a': [self.fields['a'], ['1']],
+                                  'b': [self.fields['b'], ['2']]})
+        self.assertEqual(
+            connection.close_if_unusable_or_obsolete.call_count, 2)
+
+    def test_thread_queries_counted(self):
+        """Queries in the worker threads count for a measured request."""
+        request = mock.Mock(spec=['simpleselect_stats'],
+                            simpleselect_stats={})
+        counter = mock.MagicMock()
+        counter.__enter__.return_value.count = 3
+        with mock.patch.object(views.stats, 'QueryCounter',
+                               return_value=counter):
+            views.get_batch_items({'a': ['1'], 'b': ['2']}, workers=4,
+                                  request=request)
+        self.assertEqual(request.simpleselect_stats, {'thread_queries': 6})
+
+    def test_executor_reused(self):
+        """Batches share one thread pool per number of workers."""
+        self.assertIs(views.get_batch_executor(3),
+                      views.get_batch_executor(3))
+
+
+class HTTPCachingTest(unittest.TestCase):
+    """Tests for the conditional request helpers."""
+
+    def make_field(self, max_age, private=False):
+        field = mock.Mock(http_max_age=max_age, http_private=private)
+        field.registry_key_func.return_value = 'abcde'
+        return field
+
+    def test_policy_combined(self):
+        """The shortest max-age wins, and any private field makes the
+        response private."""
+        policy = views.get_http_policy([self.make_field(60),
+                                        self.make_field(10, private=True)])
+        self.assertEqual(policy, (10, True))
+
+    def test_policy_off(self):
+        """One field without HTTP caching turns it off."""
+        policy = views.get_http_policy([self.make_field(60),
+                                        self.make_field(None)])
+        self.assertEqual(policy, (None, False))
+
+    def test_etag_follows_versions(self):
+        """A new data version or another user changes the entity tag."""
+        field = self.make_field(60)
+        etag = views.make_etag([field], [1])
+        self.assertEqual(etag, views.make_etag([field], [1]))
+        self.assertNotEqual(etag, views.make_etag([field], [2]))
+        self.assertNotEqual(etag, views.make_etag([field], [1], 'user'))
+
+    def test_if_none_match(self):
+        """A matching entity tag means not modified, whatever the date."""
+        request = mock.Mock(META={'HTTP_IF_NONE_MATCH': '"a", "b"',
+                                  'HTTP_IF_MODIFIED_SINCE': 'garbage'})
+        self.assertTrue(views.is_not_modified(request, 'b', 100))
+        self.assertFalse(views.is_not_modified(request, 'c', 100))
+
+    def test_if_modified_since(self):
+        """Without an entity tag, the date is compared."""
+        request = mock.Mock(META={
+            'HTTP_IF_MODIFIED_SINCE': 'Thu, 01 Jan 1970 00:01:40 GMT'})
+        self.assertTrue(views.is_not_modified(request, 'a', 100))
+        self.assertFalse(views.is_not_modified(request, 'a', 101))
+        self.assertFalse(views.is_not_modified(request, 'a', None))
+
+
+class CompiledQueryTest(unittest.TestCase):
+    """Tests for compiling search conditions."""
+
+    def setUp(self):
+        self.field = mock.MagicMock()
+        self.field.queries = ['name__icontains', 'code']
+        self.field.registry_key_func.return_value = 'abcde'
+        self.field.data.db = 'default'
+
+        connection = mock.MagicMock()
+        connection.ops.prep_for_like_query = \
+            lambda term: term.replace('%', '\\%').replace('_', '\\_')
+        patcher = mock.patch.object(views.django.db, 'connections',
+                                    mock.MagicMock())
+        patcher.start().__getitem__.return_value = connection
+        self.addCleanup(patcher.stop)
+        self.addCleanup(views.COMPILED_SEARCHES.clear)
+
+    def test_params_described(self):
+        """Each parameter is described by its term and what surrounds it."""
+        params = ['%simpleselect\\_term\\_0\\_%', 'simpleselect_term_1_']
+        with mock.patch.object(views, 'query'), \
+                mock.patch.object(views, 'get_where_sql',
+                                  return_value=('sql', params)):
+            compiled = views.compile_search(self.field, 2, 'default')
+        self.assertEqual(compiled, ('sql', [('%', 0, True, '%'),
+                                            ('', 1, False, '')]))
+
+    def test_related_columns_not_compiled(self):
+        """A condition needing a join can't be compiled."""
+        self.field.queries = ['maker__name__icontains']
+        self.assertIsNone(views.compile_search(self.field, 1, 'default'))
+
+    def test_terms_bound(self):
+        """Terms are escaped where the compiled condition needs it."""
+        views.COMPILED_SEARCHES[('abcde', 'default', 2)] = (
+            'sql', [('%', 0, True, '%'), ('', 1, False, '')])
+        views.compiled_query(self.field, self.field.data, ['5%', '5%'])
+        self.field.data.extra.assert_called_with(where=['sql'],
+                                                 params=['%5\\%%', '5%'])
+
+    def test_compiled_once(self):
+        """Conditions are compiled once per number of terms."""
+        with mock.patch.object(views, 'compile_search',
+                               return_value=None) as compile_search:
+            self.assertIsNone(
+                views.compiled_query(self.field, self.field.data, ['a']))
+            views.compiled_query(self.field, self.field.data, ['b'])
+        self.assertEqual(compile_search.call_count, 1)
+
+
+class DoSearchTest(unittest.TestCase):
+    """Tests for the do_search() function."""
+
+    def test_too_broad(self):
+        """A search without usable terms doesn't touch the database."""
+        field = mock.MagicMock(queries=['name__icontains'],
+                               strip_accents=False, max_terms=None,
+                               max_term_length=None, min_term_length=2,
+                               stop_terms=['inc'])
+        request = mock.Mock(GET={'term': 'a Inc'})
+        with mock.patch.object(views, 'search') as search:
+            response = views.do_search(field, request)
+        self.assertFalse(search.called)
+        self.assertEqual(json.loads(response.content.decode()), {
+            'results': [], 'more': False, 'cursor': None, 'too_broad': True})
+
+
+class GetTermsTest(unittest.TestCase):
+    """Tests for the get_terms() function."""
+
+    def make_field(self, search_backend):
+        return mock.Mock(queries=['name__icontains'], strip_accents=False,
+                         max_terms=None, max_term_length=None,
+                         min_term_length=None, stop_terms=(),
+                         search_backend=search_backend)
+
+    def test_subsumed_dropped(self):
+        """With the queries' lookups, "mit" is redundant next to "smith"."""
+        self.assertEqual(views.get_terms(self.make_field(None), 'mit smith'),
+                         ['smith'])
+
+    def test_backend_terms_kept(self):
+        """A prefix backend doesn't find "smith" with "mit", so both stay."""
+        field = self.make_field(index.PrefixIndex())
+        self.assertEqual(views.get_terms(field, 'mit Smith'),
+                         ['mit', 'smith'])
+
+
+class GetBundleTest(unittest.TestCase):
+    """Tests for the get_bundle() view."""
+
+    def setUp(self):
+        self.field = mock.MagicMock(http_private=False, database=None)
+        patcher = mock.patch.object(views.cache, 'get_or_set',
+                                    return_value=[[1, 'Acme']])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, version):
+        request = mock.Mock(GET={'bundle': '1.2'})
+        with mock.patch.object(views.bundles, 'get_bundle_version',
+                               return_value=version):
+            return views.get_bundle(self.field, request)
+
+    def test_not_bundled(self):
+        """Fields without a bundle give a 404."""
+        with self.assertRaises(views.django.http.Http404):
+            self.get(None)
+
+    def test_current_version_cached(self):
+        """A bundle requested with its current version is cacheable."""
+        response = self.get('1.2')
+        self.assertEqual(json.loads(response.content.decode()),
+                         {'version': '1.2', 'results': [[1, 'Acme']]})
+        self.assertIn('max-age={}'.format(views.BUNDLE_MAX_AGE),
+                      response['Cache-Control'])
+
+    def test_old_version_not_cached(self):
+        """A page rendered with older data gets the new bundle, uncached."""
+        response = self.get('1.3')
+        self.assertEqual(json.loads(response.content.decode())['version'],
+                         '1.3')
+        self.assertFalse(response.has_header('Cache-Control'))
@@ -0,0 +1,90 @@
+import unittest
+from unittest import mock
+
+from .. import cache
+from .. import stats
+
+
+class RecordTest(unittest.TestCase):
+    """Tests for recording and reading statistics."""
+
+    def setUp(self):
+        self.cache = cache.LRUCache('', {})
+        patcher = mock.patch.object(stats, 'get_cache',
+                                    return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.field = mock.Mock(__module__='shop.forms', __name__='ItemField')
+        self.field.registry_key_func.return_value = 'abcde'
+
+    def measure(self, duration, cache_hit=None):
+        stats.record(None, fields=[self.field], duration=duration,
+                     queries=2, rows=10, cache_hit=cache_hit)
+
+    def test_counters_summed(self):
+        """Measurements are added up per field."""
+        self.measure(0.002, cache_hit=True)
+        self.measure(0.004, cache_hit=False)
+        self.measure(0.3)
+        [result] = stats.get_stats([self.field])
+        self.assertEqual(result['key'], 'abcde')
+        self.assertEqual(result['field'], 'shop.forms.ItemField')
+        self.assertEqual(result['requests'], 3)
+        self.assertAlmostEqual(result['mean_ms'], 102)
+        self.assertEqual(result['queries'], 2)
+        self.assertEqual(result['rows'], 10)
+        self.assertEqual(result['cache_hit_ratio'], 0.5)
+        self.assertEqual(result['latency'][0], [5, 2])
+        self.assertEqual(result['latency'][6], [500, 1])
+
+    def test_counters_dont_expire(self):
+        """Counters outlive the cache's default timeout."""
+        with mock.patch.object(cache.time, 'time', return_value=1000):
+            self.measure(0.002)
+        with mock.patch.object(cache.time, 'time',
+                               return_value=1000 + 10 ** 6):
+            [result] = stats.get_stats([self.field])
+        self.assertEqual(result['requests'], 1)
+
+    def test_nothing_recorded(self):
+        """A field without requests has no averages."""
+        [result] = stats.get_stats([self.field])
+        self.assertEqual(result['requests'], 0)
+        self.assertIsNone(result['mean_ms'])
+        self.assertIsNone(result['cache_hit_ratio'])
+
+    def test_reset(self):
+        """Resetting sets the counters back to zero."""
+        self.measure(0.002)
+        stats.reset([self.field])
+        self.assertEqual(stats.get_stats([self.field])[0]['requests'], 0)
+
+
+class QueryCounterTest(unittest.TestCase):
+    """Tests for the QueryCounter class."""
+
+    def test_counts_all_connections(self):
+        """Queries logged on every connection are added up."""
+        connections = [mock.Mock(spec=['force_debug_cursor', 'queries_log'],
+                                 force_debug_cursor=False, queries_log=[1])
+                       for _ in range(2)]
+        with mock.patch.object(stats.django.db, 'connections') as all_:
+            all_.all.return_value = connections
+            with stats.QueryCounter() as counter:
+                self.assertTrue(connections[0].force_debug_cursor)
+                connections[0].queries_log.append(2)
+                connections[1].queries_log.extend([2, 3])
+        self.assertEqual(counter.count, 3)
+        self.assertFalse(connections[0].force_debug_cursor)
+
+
+class NoteTest(unittest.TestCase):
+    """Tests for the note() function."""
+
+    def test_note(self):
+        """Notes only go to requests being measured."""
+        request = mock.Mock(spec=['simpleselect_stats'],
+                            simpleselect_stats={})
+        stats.note(request, rows=3)
+        self.assertEqual(request.simpleselect_stats, {'rows': 3})
+        stats.note(mock.Mock(spec=[]), rows=3)
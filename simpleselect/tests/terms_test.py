@@ -0,0 +1,65 @@
+import unittest
+
+from .. import terms
+
+
+class NormalizeTermsTest(unittest.TestCase):
+    """Tests for the normalize_terms() function."""
+
+    def test_duplicates_dropped(self):
+        """Repeated terms are only used once."""
+        self.assertEqual(terms.normalize_terms(['a', 'b', 'a'], ['exact']),
+                         ['a', 'b'])
+
+    def test_case_folded_if_ignored(self):
+        """Terms are lowercased when no lookup cares about case."""
+        self.assertEqual(
+            terms.normalize_terms(['Jo', 'JO'], ['icontains', 'iexact']),
+            ['jo'])
+        self.assertEqual(
+            terms.normalize_terms(['Jo', 'JO'], ['icontains', 'exact']),
+            ['Jo', 'JO'])
+
+    def test_subsumed_dropped(self):
+        """Terms implied by longer ones are dropped, in input order."""
+        self.assertEqual(
+            terms.normalize_terms(['mit', 'smith', 'jo', 'john'],
+                                  ['icontains']),
+            ['smith', 'john'])
+
+    def test_subsumed_depends_on_lookups(self):
+        """A prefix lookup only makes prefixes of a term redundant."""
+        self.assertEqual(
+            terms.normalize_terms(['smi', 'mit', 'smith'], ['istartswith']),
+            ['mit', 'smith'])
+        self.assertEqual(
+            terms.normalize_terms(['jo', 'john'], ['iregex']), ['jo', 'john'])
+
+    def test_subsumption_off(self):
+        """Without subsume, only repeated terms are dropped."""
+        self.assertEqual(
+            terms.normalize_terms(['mit', 'smith', 'mit'], ['icontains'],
+                                  subsume=False),
+            ['mit', 'smith'])
+
+    def test_limits(self):
+        """Long terms are cut short and extra terms dropped."""
+        self.assertEqual(
+            terms.normalize_terms(['abcdef', 'xyz', 'q'], ['exact'],
+                                  max_terms=2, max_length=4),
+            ['abcd', 'xyz'])
+
+    def test_accents(self):
+        """Accents are only stripped when asked for."""
+        self.assertEqual(terms.normalize_terms(['José'], ['icontains']),
+                         ['josé'])
+        self.assertEqual(
+            terms.normalize_terms(['José'], ['icontains'], accents=True),
+            ['jose'])
+
+    def test_short_and_stop_terms_dropped(self):
+        """Short terms and stop terms are ignored, whatever their case."""
+        self.assertEqual(
+            terms.normalize_terms(['J', 'Acme', 'INC'], ['exact'],
+                                  min_length=2, stop_terms=['Inc']),
+            ['Acme'])
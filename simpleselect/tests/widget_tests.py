@@ -1,6 +1,12 @@
+import copy
+import gc
 import unittest
+import weakref
 from unittest import mock
 
+import django.forms
+import django.forms.formsets
+
 from .. import widgets
 
 
@@ -15,6 +21,26 @@ class AutocompleteSelectTest(unittest.TestCase):
                                        )
         self.assertIs(registry['foo'], w)
 
+    def test_default_token_deterministic(self):
+        """Widgets searching the same lookups get the same token."""
+        a = widgets.AutocompleteSelect(['name__icontains'], registry={})
+        b = widgets.AutocompleteSelect(['name__icontains'], registry={})
+        c = widgets.AutocompleteSelect(['code'], registry={})
+        self.assertEqual(a.token, b.token)
+        self.assertNotEqual(a.token, c.token)
+
+    def test_registry_stays_flat(self):
+        """Making widgets over and over doesn't grow the registry, and a
+        widget nobody uses any more is dropped from it."""
+        registry = weakref.WeakValueDictionary()
+        for i in range(10000):
+            widgets.AutocompleteSelect(['name__icontains'], registry=registry)
+        gc.collect()
+        self.assertEqual(len(registry), 0)
+
+        w = widgets.AutocompleteSelect(['name__icontains'], registry=registry)
+        self.assertEqual(list(registry.values()), [w])
+
     def test_render_uses_template_func(self):
         """The render method calls a function to get the JS script."""
         test_payload = "Test initialization script"
@@ -56,3 +82,124 @@ class UrlGeneratorTest(unittest.TestCase):
 
         result = widgets.get_json_url_for_widget(w, lookup)
         self.assertIn(result, "foo?field=bar")
+
+
+class LabelTest(unittest.TestCase):
+    """Tests for prerendering labels."""
+
+    def setUp(self):
+        self.lookup = mock.MagicMock(return_value={'1': 'One'})
+        self.widget = widgets.AutocompleteSelect(
+            None, registry={}, label_lookup=self.lookup,
+            js_initialization_template=lambda **kwargs: '',
+            json_url_maker=lambda widget: '')
+
+    def test_render_doesnt_look_up(self):
+        """Without prefetching, the browser is left to request the label."""
+        html = self.widget.render('a', 1)
+        self.assertNotIn('data-simpleselect-label', html)
+        self.assertFalse(self.lookup.called)
+
+    def test_formset_renders_without_lookups(self):
+        """An unmodified formset doesn't look up a label per form."""
+        class Form(django.forms.Form):
+            person = django.forms.CharField(widget=self.widget)
+
+        FormSet = django.forms.formsets.formset_factory(Form, extra=0)
+        formset = FormSet(initial=[{'person': i} for i in range(20)])
+
+        html = str(formset)
+        self.assertEqual(html.count('data-simpleselect-url'), 20)
+        self.assertFalse(self.lookup.called)
+
+    def test_no_lookup_without_value(self):
+        """Empty values don't need a label."""
+        self.assertNotIn('data-simpleselect-label',
+                         self.widget.render('a', ''))
+        self.assertFalse(self.lookup.called)
+
+    def test_prefetched_labels_used(self):
+        """Labels stored by prefetch_labels() are rendered."""
+        self.widget.labels['1'] = 'Prefetched'
+        self.assertIn('data-simpleselect-label="Prefetched"',
+                      self.widget.render('a', 1))
+        self.assertFalse(self.lookup.called)
+
+    def test_prefetch_batches_per_token(self):
+        """prefetch_labels() does one lookup for all widgets of a kind."""
+        forms = []
+        for value in (1, 2, 1):
+            bound_field = mock.MagicMock()
+            bound_field.field.widget = copy.deepcopy(self.widget)
+            bound_field.value.return_value = value
+            forms.append([bound_field])
+
+        widgets.prefetch_labels(forms)
+
+        self.lookup.assert_called_once_with(['1', '2'])
+        self.assertEqual(forms[2][0].field.widget.labels, {'1': 'One'})
+
+
+class TermLimitsTest(unittest.TestCase):
+    """Tests for passing search term limits to the browser."""
+
+    def render(self, **kwargs):
+        widget = widgets.AutocompleteSelect(
+            None, registry={}, js_initialization_template=lambda **kw: '',
+            json_url_maker=lambda widget: '', **kwargs)
+        return widget.render('a', '')
+
+    def test_limits_rendered(self):
+        """The minimum length and the stop terms become data attributes."""
+        html = self.render(min_term_length=3, stop_terms=['Inc', 'ltd'])
+        self.assertIn('data-simpleselect-min-length="3"', html)
+        self.assertIn('data-simpleselect-stop-terms="inc ltd"', html)
+
+    def test_no_limits(self):
+        """Without limits there are no attributes."""
+        self.assertNotIn('data-simpleselect-min-length', self.render())
+        self.assertNotIn('data-simpleselect-stop-terms', self.render())
+
+
+class BundleTest(unittest.TestCase):
+    """Tests for rendering the URL of a field's bundle."""
+
+    def render(self, version):
+        widget = widgets.AutocompleteSelect(
+            None, registry={}, js_initialization_template=lambda **kw: '',
+            json_url_maker=lambda widget: '/ac?token=abc',
+            bundle_version=lambda: version)
+        return widget.render('a', '')
+
+    def test_bundle_url_rendered(self):
+        """The bundle URL carries the data version."""
+        self.assertIn(
+            'data-simpleselect-bundle="/ac?token=abc&amp;bundle=1.2"',
+            self.render('1.2'))
+
+    def test_not_bundled(self):
+        """Fields without a bundle search on the server."""
+        self.assertNotIn('data-simpleselect-bundle', self.render(None))
+
+
+class LazyActivationTest(unittest.TestCase):
+    """Tests for rendering widgets which the browser activates lazily."""
+
+    def render(self, **kwargs):
+        widget = widgets.AutocompleteSelect(
+            None, registry={}, json_url_maker=lambda widget: '/ac?field=x',
+            **kwargs)
+        return widget.render('a', '')
+
+    def test_no_script_by_default(self):
+        """The URL is rendered as a data attribute instead of a script."""
+        html = self.render()
+        self.assertIn('data-simpleselect-url="/ac?field=x"', html)
+        self.assertNotIn('<script', html)
+
+    def test_activation_script(self):
+        """The old activation script can still be asked for."""
+        html = self.render(
+            js_initialization_template=widgets.ACTIVATE_SCRIPT.substitute)
+        self.assertIn('SimpleSelect.activateWidget("id_a", "/ac?field=x")',
+                      html)
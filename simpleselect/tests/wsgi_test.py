@@ -0,0 +1,109 @@
+import json
+import unittest
+from unittest import mock
+
+import django.http
+from django.test.client import RequestFactory
+
+from .. import fields
+from .. import views
+from .. import wsgi
+
+
+class AutocompleteApplicationTest(unittest.TestCase):
+    """Tests for the AutocompleteApplication class."""
+
+    def make_app(self, view, *middleware):
+        with mock.patch.object(wsgi.fields, 'autodiscover'):
+            app = wsgi.AutocompleteApplication(middleware=[], view=view)
+        app.middleware = list(middleware)
+        return app
+
+    def test_middleware_order(self):
+        """Requests go through the middleware in order, responses back."""
+        calls = []
+        first, second = mock.Mock(), mock.Mock()
+        first.process_request.side_effect = lambda r: calls.append(1)
+        second.process_request.side_effect = lambda r: calls.append(2)
+        first.process_response.side_effect = \
+            lambda r, resp: calls.append(4) or resp
+        second.process_response.side_effect = \
+            lambda r, resp: calls.append(3) or resp
+        response = django.http.HttpResponse()
+
+        app = self.make_app(lambda request: response, first, second)
+        self.assertIs(app.get_response(mock.Mock()), response)
+        self.assertEqual(calls, [1, 2, 3, 4])
+
+    def test_early_response(self):
+        """A response from process_request skips the view."""
+        middleware = mock.Mock(spec=['process_request'])
+        middleware.process_request.return_value = 'early'
+        view = mock.Mock()
+
+        app = self.make_app(view, middleware)
+        self.assertEqual(app.get_response(mock.Mock()), 'early')
+        self.assertFalse(view.called)
+
+    def test_not_found(self):
+        """An unknown field gives a 404."""
+        def view(request):
+            raise django.http.Http404()
+
+        response = self.make_app(view).get_response(mock.Mock())
+        self.assertEqual(response.status_code, 404)
+
+    def call(self, app, **params):
+        environ = RequestFactory().get(wsgi.DEFAULT_PATH, params).environ
+        start_response = mock.Mock()
+        response = app(environ, start_response)
+        response.close()
+        return start_response.call_args[0][0], response
+
+    def test_real_response(self):
+        """A response made by the view goes out with its status line."""
+        app = self.make_app(lambda request: views.JSONResponse({'a': 1}))
+        status, response = self.call(app)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(json.loads(response.content.decode()), {'a': 1})
+
+    def test_status_without_reason_phrase(self):
+        """Before Django 1.6, responses have no reason_phrase."""
+        response = mock.Mock(spec=['status_code'], status_code=404)
+        with mock.patch.object(wsgi.django.core.handlers.wsgi,
+                               'STATUS_CODE_TEXT', {404: 'NOT FOUND'},
+                               create=True):
+            self.assertEqual(wsgi.get_status(response), '404 NOT FOUND')
+
+    def test_fields_discovered(self):
+        """Fields are registered when the application is made, before any
+        request has imported them."""
+        registry = {}
+
+        def import_module(name):
+            type('PersonField', (fields.AutoSelectField,),
+                 {'__module__': name})
+
+        with mock.patch.object(fields, 'REGISTRY', registry), \
+                mock.patch.object(fields.importlib, 'import_module',
+                                  side_effect=import_module) as imported:
+            app = wsgi.AutocompleteApplication(
+                middleware=[], modules=['app.forms'],
+                view=lambda request: views.JSONResponse(
+                    views.get_field(request.GET['field']).__name__))
+            key, = registry
+            status, response = self.call(app, field=key)
+        imported.assert_called_once_with('app.forms')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(json.loads(response.content.decode()), 'PersonField')
+
+
+class MountTest(unittest.TestCase):
+    """Tests for the mount() function."""
+
+    def test_dispatch_on_path(self):
+        """Only the autocomplete path goes to the autocomplete app."""
+        app = wsgi.mount(lambda environ, start: 'project', '/q/',
+                         autocomplete=lambda environ, start: 'fast')
+        self.assertEqual(app({'PATH_INFO': '/q/'}, None), 'fast')
+        self.assertEqual(app({'PATH_INFO': '/q/x/'}, None), 'project')
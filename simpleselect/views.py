@@ -1,27 +1,44 @@
 # Create your views here.
-import json
+import collections
+import concurrent.futures
+import hashlib
+import threading
+import time
 from functools import reduce
 
+import django.conf
+import django.core.exceptions
+import django.db
 import django.db.models
 import django.http
+import django.utils.cache
+import django.utils.http
 
+from . import bundles
+from . import cache
+from . import encoders
 from . import fields
+from . import labels
+from . import signals
+from . import stats
+from .terms import normalize_terms
 
 
 class JSONResponse(django.http.HttpResponse):
     """An HTTP response with a 'content-type: application/json' header"""
 
     def __init__(self, content='', status=200, reason=None,
-                 json_converter=json.dumps):
+                 json_converter=encoders.dumps):
         """Create a JSONResponse by converting the given content to JSON.
 
         :type  content: Python object
         :param content: The response body, which gets converted to JSON.
 
         :type  json_converter: callable
-        :param json_converter: A Python->JSON converter. By default, this is
-                               the ``json.dumps`` function of the Python
-                               standard library.
+        :param json_converter: A Python->JSON converter, returning ``str`` or
+                               ``bytes``. By default, this is the encoder
+                               chosen by the ``SIMPLESELECT_JSON_ENCODER``
+                               setting; see :py:mod:`simpleselect.encoders`.
 
         For all other parameters, see the `official Django documentation`_.
 
@@ -33,6 +50,59 @@ class JSONResponse(django.http.HttpResponse):
                                            status, reason)
 
 
+class StreamingJSONResponse(django.http.StreamingHttpResponse):
+    """A search response whose results are encoded one chunk at a time.
+
+    The body is the same JSON object :py:func:`do_search` returns, but only
+    ``chunk_size`` results are held in memory at once. Because ``more`` is
+    only known at the end, it is sent after the ``results`` list.
+
+    """
+
+    def __init__(self, rows, serializer, offset=0, limit=None, status=200,
+                 reason=None, json_converter=encoders.dumps, chunk_size=100):
+        """Create a streaming response.
+
+        :type  rows: iterable
+        :param rows: The results, starting at ``offset``. If ``limit`` is
+                     given, up to ``limit + 1`` are read to find out whether
+                     there are more.
+
+        :type  serializer: callable
+        :param serializer: Turns one row into a JSON-ready object.
+
+        :type  json_converter: callable
+        :param json_converter: A Python->JSON converter returning ``bytes``.
+
+        For all other parameters, see :py:class:`JSONResponse`.
+
+        """
+        content = self.encode(rows, serializer, offset, limit,
+                              json_converter, chunk_size)
+        super().__init__(content, 'application/json', status, reason)
+
+    @staticmethod
+    def encode(rows, serializer, offset, limit, json_converter, chunk_size):
+        """Generate the JSON body in pieces of ``chunk_size`` results."""
+        yield b'{"results":['
+        chunk = []
+        count = 0
+        more = False
+        for row in rows:
+            if count == limit:
+                more = True
+                break
+            chunk.append(json_converter(serializer(row)))
+            count += 1
+            if len(chunk) == chunk_size:
+                yield (b',' if count > chunk_size else b'') + b','.join(chunk)
+                chunk = []
+        if chunk:
+            yield (b',' if count > len(chunk) else b'') + b','.join(chunk)
+        yield (b'],"more":' + json_converter(more) + b',"cursor":' +
+               json_converter(offset + count if more else None) + b'}')
+
+
 def and_together(queries):
     """Join the given queries by ANDing.
 
@@ -117,6 +187,104 @@ def create_queries(terms, queries, query_factory):
         yield or_together(term_on_all_queries)
 
 
+#: Lookup types which can end a query string in ``AutoSelectField.queries``.
+LOOKUP_TYPES = ('exact', 'iexact', 'contains', 'icontains', 'startswith',
+                'istartswith', 'endswith', 'iendswith', 'regex', 'iregex')
+
+
+def split_query(query_string):
+    """Split a query string into the column it searches and its lookup type.
+
+    A query string without a lookup type is an ``exact`` lookup.
+
+    >>> split_query('company__name__icontains')
+    ('company__name', 'icontains')
+    >>> split_query('code')
+    ('code', 'exact')
+
+    """
+    column, sep, lookup = query_string.rpartition('__')
+    if sep and lookup in LOOKUP_TYPES:
+        return column, lookup
+    return query_string, 'exact'
+
+
+def get_columns(field):
+    """Get the columns searched by ``field.queries``, without lookup types.
+
+    :rtype: list of str
+
+    """
+    columns = []
+    for query_string in field.queries:
+        column, _ = split_query(query_string)
+        if column not in columns:
+            columns.append(column)
+    return columns
+
+
+def get_column_sql(field, column, connection):
+    """Get the quoted, table-qualified SQL name of one of ``field``'s columns.
+
+    :type  column: str
+    :param column: A field name of the model, as in ``queries``.
+
+    Only the model's own columns can be named this way; for a column of a
+    related model this raises ImproperlyConfigured.
+
+    """
+    if '__' in column:
+        raise django.core.exceptions.ImproperlyConfigured(
+            "Can't refer to {!r} in SQL: only the model's own columns are "
+            "supported.".format(column))
+    opts = field.data.model._meta
+    qn = connection.ops.quote_name
+    return '{}.{}'.format(qn(opts.db_table), qn(opts.get_field(column).column))
+
+
+#: The name of the extra column holding the relevance of each result
+RANK_COLUMN = 'simpleselect_rank'
+
+
+def rank_objects(field, qset, terms):
+    """Order search results so the best matches come first.
+
+    For each term, an object scores 3 if one of the field's columns equals
+    it, 2 if a column starts with it and 1 otherwise (i.e. it only contains
+    it). The scores of all terms are added up in the database with ``CASE``
+    expressions, so with a ``LIMIT`` only the best rows are sent back and
+    nothing is sorted in Python. Ties are broken by primary key.
+
+    Columns of related models aren't used for ranking.
+
+    """
+    columns = [column for column in get_columns(field) if '__' not in column]
+    if not terms or not columns:
+        return qset
+    connection = django.db.connections[qset.db]
+    ops = connection.ops
+    columns = [get_column_sql(field, column, connection)
+               for column in columns]
+
+    def matches_any(lookup):
+        """SQL checking whether any column matches a term with ``lookup``,
+        written the way Django does for this database."""
+        return ' OR '.join('{} {}'.format(ops.lookup_cast(lookup) % column,
+                                          connection.operators[lookup])
+                           for column in columns)
+
+    cases, params = [], []
+    for term in terms:
+        cases.append('CASE WHEN {} THEN 3 WHEN {} THEN 2 ELSE 1 END'.format(
+            matches_any('iexact'), matches_any('istartswith')))
+        params.extend([ops.prep_for_iexact_query(term)] * len(columns))
+        params.extend([ops.prep_for_like_query(term) + '%'] * len(columns))
+
+    return qset.extra(select={RANK_COLUMN: ' + '.join(cases)},
+                      select_params=params,
+                      order_by=['-' + RANK_COLUMN, qset.model._meta.pk.name])
+
+
 def query(filter_func, terms, queries, query_factory, query_factory_applier,
           query_joiner):
     """Use the given terms and `Django queries`_ to filter results.
@@ -147,46 +315,746 @@ def query(filter_func, terms, queries, query_factory, query_factory_applier,
     return filter_func(final_query)
 
 
-def jsonify_queryset(qset):
+#: Compiled search conditions by registry key, database alias and number of
+#: terms; ``None`` for searches which can't be compiled.
+COMPILED_SEARCHES = {}
+
+#: Searches with more terms than this aren't compiled, so the cache can't be
+#: filled up with requests for ever more terms.
+MAX_COMPILED_TERMS = 8
+
+#: Stands for each search term while compiling. The underscores show whether
+#: Django escaped the term for a ``LIKE`` pattern.
+TERM_MARKER = 'simpleselect_term_{}_'
+
+
+def get_where_sql(qset):
+    """Compile the ``WHERE`` clause of a QuerySet to SQL and parameters."""
+    compiler = qset.query.get_compiler(qset.db)
+    if hasattr(compiler, 'compile'):
+        return compiler.compile(qset.query.where)
+    # Django < 1.7
+    return qset.query.where.as_sql(compiler.quote_name_unless_alias,
+                                   compiler.connection)
+
+
+def compile_search(field, term_count, using):
+    """Compile the condition of a search with ``term_count`` terms.
+
+    The condition is built like :py:func:`query` does, with markers in
+    place of the terms, and compiled once; every parameter is then described
+    by what's around its term and whether the term was escaped.
+
+    :rtype: tuple or None
+    :returns: The SQL and a list of ``(prefix, term index, escaped,
+              suffix)`` tuples, one per parameter; ``None`` if the search
+              can't be compiled on its own, e.g. because it needs a join for
+              a related column.
+
+    """
+    if any('__' in column for column in get_columns(field)):
+        return None
+    markers = [TERM_MARKER.format(i) for i in range(term_count)]
+    ops = django.db.connections[using].ops
+    try:
+        qset = query(field.data.model._base_manager.using(using).filter,
+                     markers, field.queries, django.db.models.Q,
+                     create_queries, and_together)
+        sql, params = get_where_sql(qset)
+    except (ValueError, TypeError, django.core.exceptions.FieldError):
+        return None
+
+    bindings = []
+    for param in params:
+        for index, marker in enumerate(markers):
+            escaped_marker = ops.prep_for_like_query(marker)
+            if isinstance(param, str) and escaped_marker in param:
+                prefix, _, suffix = param.partition(escaped_marker)
+                bindings.append((prefix, index, True, suffix))
+                break
+            if isinstance(param, str) and marker in param:
+                prefix, _, suffix = param.partition(marker)
+                bindings.append((prefix, index, False, suffix))
+                break
+        else:
+            return None
+    return sql, bindings
+
+
+def compiled_query(field, qset, terms):
+    """Filter ``qset``, i.e. ``field.data``, by ``terms`` with a compiled
+    condition.
+
+    Conditions are compiled by :py:func:`compile_search` once per field,
+    database and number of terms; each request only binds its terms.
+
+    :returns: A QuerySet, or ``None`` if the search can't be compiled.
+
+    """
+    if not terms or len(terms) > MAX_COMPILED_TERMS:
+        return None
+    using = qset.db
+    key = (field.registry_key_func(), using, len(terms))
+    try:
+        compiled = COMPILED_SEARCHES[key]
+    except KeyError:
+        compiled = COMPILED_SEARCHES[key] = compile_search(field, len(terms),
+                                                           using)
+    if compiled is None:
+        return None
+
+    sql, bindings = compiled
+    ops = django.db.connections[using].ops
+    params = [prefix + (ops.prep_for_like_query(terms[index]) if escaped
+                        else terms[index]) + suffix
+              for prefix, index, escaped, suffix in bindings]
+    return qset.extra(where=[sql], params=params)
+
+
+def serialize_objects(qset, label_format=None):
+    """Get a list of ``{'pk': ..., 'label': ...}`` dicts for objects in qset.
+
+    qset can actually be any iterable, of model instances, ``values()`` rows
+    or :py:class:`simpleselect.labels.Choice` objects. See
+    :py:func:`simpleselect.labels.make_label` for ``label_format``.
+
+    """
+    return [serialize_object(o, label_format) for o in qset]
+
+
+def serialize_object(obj, label_format=None):
+    """Get the ``{'pk': ..., 'label': ...}`` dict for one object."""
+    return {'pk': labels.get_pk(obj),
+            'label': labels.make_label(obj, label_format)}
+
+
+def jsonify_queryset(qset, label_format=None):
     """Get a JSONResponse which is a list of objects in qset.
 
     qset can actually be any iterable.
 
     """
-    objs = [{'pk': o.pk, 'label': str(o)} for o in qset]
-    return JSONResponse(objs)
+    return JSONResponse(serialize_objects(qset, label_format))
+
+
+def get_label_queryset(field, qset):
+    """Apply ``field``'s label settings to ``qset``.
+
+    See :py:func:`simpleselect.labels.prepare_queryset`.
+
+    """
+    return labels.prepare_queryset(qset, field.label_format,
+                                   field.label_related)
+
+
+def get_int_param(params, name, default, minimum=0):
+    """Read a non-negative integer out of a querystring.
+
+    :type  params: QueryDict
+    :param params: Usually ``request.GET``.
+
+    Missing or malformed values give ``default``; values below ``minimum`` are
+    clamped up to it.
+
+    >>> get_int_param({'page': '3'}, 'page', 1)
+    3
+    >>> get_int_param({'page': 'x'}, 'page', 1)
+    1
+
+    """
+    try:
+        value = int(params.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    return max(value, minimum)
+
+
+def get_offset(params, page_size):
+    """Find how many results to skip for a search request.
+
+    An explicit ``cursor`` (the offset handed out by a previous response) wins
+    over ``page``, which counts from 1.
+
+    :type  page_size: int or None
+    :param page_size: The number of results per page; ``None`` means results
+                      aren't paged, so only ``cursor`` is honoured.
+
+    """
+    if params.get('cursor'):
+        return get_int_param(params, 'cursor', 0)
+    if page_size is None:
+        return 0
+    page = get_int_param(params, 'page', 1, minimum=1)
+    return (page - 1) * page_size
+
+
+def paginate(objects, offset, limit):
+    """Take one page out of a sequence of results.
+
+    One extra row is fetched past ``limit`` to find out whether another page
+    exists, so with a QuerySet the database sees a single ``LIMIT limit + 1``
+    query and never returns more rows than that.
+
+    :type  objects: QuerySet or sequence
+    :param objects: Anything that supports slicing.
+
+    :type  limit: int or None
+    :param limit: The page size, or ``None`` to return everything from
+                  ``offset`` onwards.
+
+    :returns: ``(rows, more)`` where ``rows`` is a list of at most ``limit``
+              objects and ``more`` is True if there are rows after them.
+
+    >>> paginate(range(10), 2, 3)
+    ([2, 3, 4], True)
+    >>> paginate(range(10), 8, 3)
+    ([8, 9], False)
+
+    """
+    if limit is None:
+        return list(objects[offset:]), False
+    rows = list(objects[offset:offset + limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+def get_read_data(field):
+    """Get ``field.data`` on the database autocomplete requests read from.
+
+    That's the alias named by ``field.database``, or else by the
+    ``SIMPLESELECT_DATABASE`` setting, e.g. a read replica. If neither is
+    set, ``field.data`` is used as it is.
+
+    """
+    alias = field.database or getattr(django.conf.settings,
+                                      'SIMPLESELECT_DATABASE', None)
+    if alias is None:
+        return field.data
+    return field.data.using(alias)
+
+
+def find_objects(field, terms):
+    """Get everything in a field's data that matches the search terms.
+
+    :param field: The AutoSelectField subclass to search.
+
+    :type  terms: seq of str
+    :param terms: The search terms.
+
+    :returns: A QuerySet in a stable order, prepared for building labels, or
+              a list from the field's ``search_backend``.
+
+    """
+    data = get_read_data(field)
+    if field.search_backend is None:
+        objects = None
+        if field.compile_search:
+            objects = compiled_query(field, data, terms)
+        if objects is None:
+            objects = query(data.filter,
+                            terms,
+                            field.queries,
+                            django.db.models.Q,
+                            create_queries,
+                            and_together)
+        if field.rank_results:
+            objects = rank_objects(field, objects, terms)
+    else:
+        objects = field.search_backend.filter(field, data, terms)
+
+    # backends may also answer with a list of labels.Choice objects
+    if isinstance(objects, django.db.models.query.QuerySet):
+        # paging needs a stable order
+        if not objects.ordered:
+            objects = objects.order_by('pk')
+        objects = get_label_queryset(field, objects)
+    return objects
+
+
+def search(field, terms, offset):
+    """Find one page of suggestions for a field.
+
+    :param field: The AutoSelectField subclass to search.
+
+    :type  terms: seq of str
+    :param terms: The search terms.
+
+    :type  offset: int
+    :param offset: The number of results to skip.
+
+    :returns: The JSON-ready search response body; see :py:func:`do_search`.
+
+    """
+    objects = find_objects(field, terms)
+    rows, more = paginate(objects, offset, field.max_results)
+    return {
+        'results': serialize_objects(rows, field.label_format),
+        'more': more,
+        'cursor': offset + len(rows) if more else None,
+    }
+
+
+def stream_search(field, terms, offset):
+    """Like :py:func:`search`, but get a :py:class:`StreamingJSONResponse`.
+
+    Rows are read from the database with ``QuerySet.iterator()``, so no model
+    instances are kept around once they have been encoded.
+
+    """
+    objects = find_objects(field, terms)
+    limit = field.max_results
+    if limit is None:
+        rows = objects[offset:]
+    else:
+        rows = objects[offset:offset + limit + 1]
+    if isinstance(rows, django.db.models.query.QuerySet):
+        rows = rows.iterator()
+    return StreamingJSONResponse(
+        rows, lambda obj: serialize_object(obj, field.label_format),
+        offset, limit)
+
+
+def get_terms(field, term_string):
+    """Split a search string into terms and clean them up for ``field`` (see
+    :py:func:`simpleselect.terms.normalize_terms`).
+
+    Which terms make others redundant depends on the lookup types, so with a
+    ``search_backend``, which matches in its own way, none are dropped for
+    that.
+
+    """
+    lookups = [split_query(query_string)[1] for query_string in field.queries]
+    return normalize_terms(term_string.split(), lookups, field.strip_accents,
+                           field.max_terms, field.max_term_length,
+                           field.min_term_length, field.stop_terms,
+                           subsume=field.search_backend is None)
 
 
 def do_search(field, request):
-    """Process an autosuggestion search."""
-    objects = query(field.data.filter,
-                    request.GET.get('term', '').split(),
-                    field.queries,
-                    django.db.models.Q,
-                    create_queries,
-                    and_together)
-    return jsonify_queryset(objects)
+    """Process an autosuggestion search.
+
+    If ``field.cache_timeout`` isn't ``None``, results are served from the
+    cache (see :py:mod:`simpleselect.cache`) when possible. Otherwise, if
+    ``field.stream_results`` is set, the response is streamed.
+
+    The response is an object with these keys:
+
+    * ``results``: a list of ``{'pk': ..., 'label': ...}`` objects, at most
+      ``field.max_results`` long.
+
+    * ``more``: whether there are results past this page.
+
+    * ``cursor``: the value of the ``cursor`` parameter that fetches the next
+      page, or ``None`` if this is the last one.
+
+    If no term is left after dropping those shorter than
+    ``field.min_term_length`` and ``field.stop_terms``, the database isn't
+    asked; the response has no results and ``too_broad`` is true.
+
+    """
+    terms = get_terms(field, request.GET.get('term', ''))
+    if not terms:
+        stats.note(request, rows=0)
+        return JSONResponse({'results': [], 'more': False, 'cursor': None,
+                             'too_broad': True})
+    offset = get_offset(request.GET, field.max_results)
+
+    if field.cache_timeout is None:
+        if field.stream_results:
+            return stream_search(field, terms, offset)
+        body = search(field, terms, offset)
+    else:
+        misses = []
+
+        def produce():
+            misses.append(True)
+            return search(field, terms, offset)
+
+        body = cache.get_or_set(cache.get_search_key(field, terms, offset),
+                                produce, field.cache_timeout)
+        stats.note(request, cache_hit=not misses)
+    stats.note(request, rows=len(body['results']))
+    return JSONResponse(body)
+
+
+def get_items(field, ids):
+    """Look up several objects of a field by their IDs with one query.
+
+    :type  ids: seq of str
+    :param ids: Primary keys, as given in the querystring.
+
+    The objects are read from the database :py:func:`get_read_data` picks.
+    If that's a replica, IDs it doesn't know yet (e.g. of objects which were
+    just created) are looked up again in ``field.data``'s own database.
+
+    :returns: Serialized objects (see :py:func:`serialize_objects`) in the
+              order of ``ids``. IDs which don't exist are left out.
+
+    """
+    data = get_read_data(field)
+    choices = labels.lookup(data, ids, field.label_format,
+                            field.label_related)
+    if data.db != field.data.db:
+        found = {str(choice.pk): choice for choice in choices}
+        missing = [id for id in ids if str(id) not in found]
+        if missing:
+            found.update((str(choice.pk), choice) for choice in labels.lookup(
+                field.data, missing, field.label_format, field.label_related))
+            choices = [found[id] for id in
+                       collections.OrderedDict.fromkeys(str(id) for id in ids)
+                       if id in found]
+    return serialize_objects(choices)
 
 
 def get_item_detail(field, request):
-    """Process a request for one specific object by it's ID."""
-    id = request.GET['id']
-    obj = field.data.get(pk=id)
-    return jsonify_queryset([obj])
+    """Process a request for specific objects by their IDs.
 
+    The ``id`` parameter may be given more than once; all of the objects are
+    fetched with one query.
 
-def autocomplete_filter(request):
-    field = request.GET.get('field')
-    if field not in fields.REGISTRY:
+    """
+    items = get_items(field, request.GET.getlist('id'))
+    stats.note(request, rows=len(items))
+    return JSONResponse(items)
+
+
+#: How long browsers may keep a bundle whose URL has the current version.
+BUNDLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def get_bundle(field, request):
+    """Send all choices of a small field (see :py:mod:`simpleselect.bundles`).
+
+    The ``bundle`` parameter is the version of the field's data the page was
+    rendered with. The response is an object with the current ``version``
+    and the ``results`` as ``[pk, label]`` pairs. If the version in the URL is
+    the current one, the response may be cached for a year, since newer data
+    gets a new URL.
+
+    Fields which aren't bundled (any more) give a 404.
+
+    """
+    version = bundles.get_bundle_version(field)
+    if version is None:
+        raise django.http.Http404("Field {} isn't bundled."
+                                  .format(field.registry_key_func()))
+    results = cache.get_or_set(
+        bundles.get_bundle_key(field, version),
+        lambda: bundles.make_bundle(field, get_read_data(field)), None)
+    stats.note(request, rows=len(results))
+
+    response = JSONResponse({'version': version, 'results': results})
+    if request.GET.get('bundle') == version:
+        visibility = 'private' if field.http_private else 'public'
+        django.utils.cache.patch_cache_control(
+            response, max_age=BUNDLE_MAX_AGE, **{visibility: True})
+    return response
+
+
+def parse_lookups(values):
+    """Group ``field:id`` pairs from a batched lookup by field.
+
+    :rtype: OrderedDict
+    :returns: A map of registry keys to lists of IDs.
+
+    >>> parse_lookups(['abcde:1', 'fghij:7', 'abcde:2'])
+    OrderedDict([('abcde', ['1', '2']), ('fghij', ['7'])])
+
+    """
+    lookups = collections.OrderedDict()
+    for value in values:
+        key, _, id = value.partition(':')
+        lookups.setdefault(key, []).append(id)
+    return lookups
+
+
+def get_batch_detail(request):
+    """Process a request for objects of several fields at once.
+
+    Every ``lookup`` parameter is a registry key and an ID separated by a
+    colon, e.g. ``?lookup=abcde:1&lookup=abcde:2&lookup=fghij:7``. Each field's
+    objects are fetched with a single query. The response maps each registry
+    key to a list like the ones :py:func:`get_item_detail` returns.
+
+    """
+    lookups = parse_lookups(request.GET.getlist('lookup'))
+    workers = getattr(django.conf.settings, 'SIMPLESELECT_BATCH_WORKERS', 1)
+    items = get_batch_items(lookups, workers, request)
+    stats.note(request, rows=sum(len(found) for found in items.values()))
+    return JSONResponse(items)
+
+
+def get_batch_items(lookups, workers=1, request=None):
+    """Look up the objects of several fields, possibly in parallel.
+
+    :type  lookups: dict
+    :param lookups: Registry keys mapped to lists of IDs, as returned by
+                    :py:func:`parse_lookups`.
+
+    :type  workers: int
+    :param workers: How many fields may be queried at the same time, by the
+                    threads of :py:func:`get_batch_executor`.
+
+    :param request: If given and being measured (see
+                    :py:mod:`simpleselect.stats`), the queries run in
+                    those threads are counted for it too.
+
+    :rtype: dict
+    :returns: The registry keys mapped to the lists :py:func:`get_items`
+              returns.
+
+    """
+    # find all fields up front, so an unknown key fails before any query
+    batch = [(key, get_field(key), ids) for key, ids in lookups.items()]
+    if workers <= 1 or len(batch) <= 1:
+        return {key: get_items(field, ids) for key, field, ids in batch}
+
+    count = hasattr(request, 'simpleselect_stats')
+    pool = get_batch_executor(workers)
+    futures = [(key, pool.submit(get_items_in_thread, field, ids, count))
+               for key, field, ids in batch]
+    items, queries = {}, 0
+    for key, future in futures:
+        items[key], thread_queries = future.result()
+        queries += thread_queries
+    stats.note(request, thread_queries=queries)
+    return items
+
+
+#: Thread pools for batched lookups, by number of workers.
+BATCH_EXECUTORS = {}
+
+BATCH_EXECUTORS_LOCK = threading.Lock()
+
+
+def get_batch_executor(workers):
+    """Get the process's pool of ``workers`` threads for batched lookups.
+
+    The threads are made once and kept, and so are their database
+    connections (see :py:func:`get_items_in_thread`).
+
+    """
+    with BATCH_EXECUTORS_LOCK:
+        if workers not in BATCH_EXECUTORS:
+            BATCH_EXECUTORS[workers] = \
+                concurrent.futures.ThreadPoolExecutor(workers)
+        return BATCH_EXECUTORS[workers]
+
+
+def close_obsolete_connections():
+    """Close the current thread's database connections which are broken or
+    older than ``CONN_MAX_AGE``, like Django does between requests. Before
+    Django 1.6, which has no persistent connections, all of them are
+    closed."""
+    for connection in django.db.connections.all():
+        if hasattr(connection, 'close_if_unusable_or_obsolete'):
+            connection.close_if_unusable_or_obsolete()
+        else:
+            connection.close()
+
+
+def get_items_in_thread(field, ids, count=False):
+    """Run :py:func:`get_items` in a thread of a batch executor.
+
+    Those threads serve no requests, so Django never tidies up their
+    connections; that is done before each lookup instead.
+
+    :param count: Whether to count the queries, which the request's own
+                  :py:class:`simpleselect.stats.QueryCounter` can't see.
+
+    :returns: The items and the number of queries (0 if not counted).
+
+    """
+    close_obsolete_connections()
+    if not count:
+        return get_items(field, ids), 0
+    with stats.QueryCounter() as counter:
+        items = get_items(field, ids)
+    return items, counter.count
+
+
+def get_field(key):
+    """Get a field class from the global registry, or raise Http404."""
+    field = fields.REGISTRY.get(key)
+    if field is None:
         raise django.http.Http404("Can't find field {} in global registry."
                                   "Registered fields: {}"
-                                  .format(field, fields.REGISTRY.keys()))
-    field = fields.REGISTRY[request.GET['field']]
+                                  .format(key, fields.REGISTRY.keys()))
+    return field
+
+
+def get_request_fields(request):
+    """Get the field classes a request is for, or raise Http404."""
+    if request.GET.get('lookup'):
+        return [get_field(key)
+                for key in parse_lookups(request.GET.getlist('lookup'))]
+    return [get_field(request.GET.get('field'))]
+
+
+def get_http_policy(request_fields):
+    """Combine the HTTP caching options of the fields of one request.
+
+    :rtype: tuple
+    :returns: The ``max-age`` in seconds, or ``None`` if any field turns HTTP
+              caching off, and whether the response is private.
+
+    """
+    ages = [field.http_max_age for field in request_fields]
+    if None in ages:
+        return None, False
+    return min(ages), any(field.http_private for field in request_fields)
+
+
+def make_etag(request_fields, versions, user_key=''):
+    """Make the entity tag of a response from its fields' data versions.
+
+    :type  user_key: str
+    :param user_key: Identifies the user for private responses, so a
+                     different login on the same browser never gets a
+                     ``304`` for someone else's response.
+
+    """
+    parts = [field.registry_key_func() for field in request_fields]
+    parts.extend(str(version) for version in versions)
+    parts.append(user_key)
+    return hashlib.sha1('\0'.join(parts).encode('utf-8')).hexdigest()
+
+
+def is_not_modified(request, etag, last_modified):
+    """Check a request's conditional headers against a response's validators.
+
+    ``If-None-Match`` wins over ``If-Modified-Since``, which only has a
+    resolution of seconds.
+
+    :type  last_modified: int or None
+    :param last_modified: A timestamp in seconds, or ``None`` to only compare
+                          entity tags.
+
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        return (if_none_match.strip() == '*' or
+                etag in django.utils.http.parse_etags(if_none_match))
+    if last_modified is None:
+        return False
+    since = django.utils.http.parse_http_date_safe(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'))
+    return since is not None and last_modified <= since
+
+
+def set_cache_headers(response, etag, last_modified, max_age, private):
+    """Add validators and the caching policy to ``response``.
+
+    A ``Cache-Control`` header the response already has, like the one of a
+    bundle, is kept.
+
+    """
+    response['ETag'] = django.utils.http.quote_etag(etag)
+    if last_modified is not None:
+        response['Last-Modified'] = django.utils.http.http_date(last_modified)
+    if not response.has_header('Cache-Control'):
+        visibility = 'private' if private else 'public'
+        django.utils.cache.patch_cache_control(response, max_age=max_age,
+                                               **{visibility: True})
+    if private:
+        django.utils.cache.patch_vary_headers(response, ['Cookie'])
+
+
+def autocomplete_filter(request):
+    """Answer an autocomplete request.
+
+    With the ``SIMPLESELECT_STATS`` setting on, the request is measured and
+    :py:data:`simpleselect.signals.request_measured` is sent.
+
+    """
+    request_fields = get_request_fields(request)
+    if not stats.is_enabled():
+        return get_conditional_response(request, request_fields)
+
+    request.simpleselect_stats = {'rows': None, 'cache_hit': None,
+                                  'thread_queries': 0}
+    start = time.time()
+    with stats.QueryCounter() as counter:
+        response = get_conditional_response(request, request_fields)
+    thread_queries = request.simpleselect_stats.pop('thread_queries')
+    if request.GET.get('lookup'):
+        kind = 'batch'
+    elif request.GET.get('id'):
+        kind = 'lookup'
+    elif request.GET.get('bundle'):
+        kind = 'bundle'
+    else:
+        kind = 'search'
+    signals.request_measured.send(
+        sender=autocomplete_filter, fields=request_fields, kind=kind,
+        duration=time.time() - start,
+        queries=counter.count + thread_queries,
+        **request.simpleselect_stats)
+    return response
+
+
+def stats_view(request):
+    """Show the statistics of every registered field as JSON, the fields
+    taking the most time in total first. Only staff members may see them.
+
+    This view isn't in ``simpleselect.urls``; add it to a URLconf to use it.
+
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_staff:
+        raise django.core.exceptions.PermissionDenied
+    field_stats = stats.get_stats(list(fields.REGISTRY.values()))
+    field_stats.sort(key=lambda s: s['total_ms'], reverse=True)
+    return JSONResponse(field_stats)
+
+
+def get_conditional_response(request, request_fields):
+    """Answer a request, with HTTP caching if the fields ask for it (see
+    ``AutoSelectField.http_max_age``).
+
+    The data versions of the fields' models make the ``ETag`` and
+    ``Last-Modified`` headers, so a conditional request is answered with
+    ``304 Not Modified`` without running any query.
+
+    """
+    max_age, private = get_http_policy(request_fields)
+    if max_age is None:
+        return get_response(request)
+
+    models = list(collections.OrderedDict.fromkeys(
+        model for field in request_fields
+        for model in cache.get_field_models(field)))
+    versions = cache.get_versions(models)
+    if private:
+        etag = make_etag(request_fields, versions,
+                         request.META.get('HTTP_COOKIE', ''))
+        last_modified = None
+    else:
+        etag = make_etag(request_fields, versions)
+        last_modified = max(versions) // 1000
+
+    if is_not_modified(request, etag, last_modified):
+        response = django.http.HttpResponseNotModified()
+    else:
+        response = get_response(request)
+        if response.status_code != 200:
+            return response
+    set_cache_headers(response, etag, last_modified, max_age, private)
+    return response
+
+
+def get_response(request):
+    """Route a request to the view function for its kind."""
+    if request.GET.get('lookup'):
+        return get_batch_detail(request)
+
+    field = get_field(request.GET.get('field'))
 
     # this is either an autosuggest search, or a query for a specific item
     # by its ID for its autocomplete data
     if request.GET.get('id'):
         delegate = get_item_detail
+    elif request.GET.get('bundle'):
+        delegate = get_bundle
     else:
         delegate = do_search
 
@@ -1,6 +1,8 @@
 """Widgets that allow autocompletion."""
-import uuid
+import collections
+import hashlib
 import string
+import weakref
 
 import django.core.urlresolvers
 import django.forms
@@ -8,9 +10,14 @@ import django.utils.html
 from django.utils.safestring import mark_safe
 
 
-REGISTRY = {}
+#: The latest live widget for each token. Widgets are only weakly referenced,
+#: so forms made per request don't pile up here.
+REGISTRY = weakref.WeakValueDictionary()
 
-# This snippet is output by the widget
+# A script activating one widget as soon as the page is ready. Widgets don't
+# need it: simpleselect.js finds them by their ``data-simpleselect-url`` and
+# activates each one lazily. Pass ``ACTIVATE_SCRIPT.substitute`` as the
+# ``js_initialization_template`` of a widget to get the old, eager behaviour.
 ACTIVATE_SCRIPT = string.Template('''
 <script type="text/javascript">
     window.SIMPLESELECT_ACTIVATORS = window.SIMPLESELECT_ACTIVATORS || [];
@@ -22,6 +29,24 @@ ACTIVATE_SCRIPT = string.Template('''
 ''')
 
 
+def get_queries_token(widget_instance):
+    """Get a token for a widget from its ``queries``.
+
+    Widgets searching the same lookups get the same token, so making more of
+    them doesn't make the registry grow. Widgets of an AutoSelectField use
+    the field's registry key instead.
+
+    :rtype: str
+
+    >>> get_queries_token(AutocompleteSelect(['name__icontains'], registry={}))
+    'q2667915f'
+
+    """
+    queries = widget_instance.queries or []
+    digest = hashlib.sha1(','.join(queries).encode('utf-8')).hexdigest()
+    return 'q' + digest[:8]
+
+
 def get_json_url_for_widget(widget_instance,
                             urllookup=django.core.urlresolvers.reverse):
     """Get the URL that provides autocomplete suggestions for a widget.
@@ -57,25 +82,27 @@ class AutocompleteSelect(django.forms.Widget):
     """
 
     def __init__(self, queries, attrs=None, registry=None,
-                 token_generator=(lambda self: str(uuid.uuid4())),
+                 token_generator=get_queries_token,
                  json_url_maker=get_json_url_for_widget,
-                 js_initialization_template=ACTIVATE_SCRIPT.substitute):
+                 js_initialization_template=None,
+                 label_lookup=None, min_term_length=None, stop_terms=(),
+                 bundle_version=None):
         """Create a new autocompleting select widget.
 
         :param token_generator:
             A callable which takes the widget instance and returns a suitable
             token. Note that the widget does not have a "field name" or
             anything of that sort at its disposal, and this is due to the
-            architecture of the Django form system.  Defaults to the Python
-            standard library ``uuid.uuid4`` function.
+            architecture of the Django form system. Defaults to
+            :py:func:`get_queries_token`; tokens should be the same for every
+            instance of the same kind of widget.
 
         :type  registry: dict
         :param registry:
             A map of tokens to widget instances; the widget adds itself to this
-            registry when constructed. By default this is used in the JSON
-            service to access the choices of this widget. By default, uses a
-            plain dictionary at ``simpleselect.REGISTRY``.
-            TODO: make sure this forward is setup properly
+            registry when constructed, replacing any earlier widget with the
+            same token. By default, uses the ``WeakValueDictionary`` at
+            ``simpleselect.widgets.REGISTRY``.
 
         :param js_initialization_template:
             A callable that produces a string which when injected into the
@@ -88,21 +115,66 @@ class AutocompleteSelect(django.forms.Widget):
 
             It should produce a string (which will be marked safe).
 
+            By default there is no script: the rendered input carries the URL
+            in a ``data-simpleselect-url`` attribute, and ``simpleselect.js``
+            activates the widget when it scrolls into view or gets focus, so
+            pages with hundreds of widgets don't pay for all of them up front.
+
 
         :param json_url_maker:
             A callable that is given the widget instance and should return a
             string which jQueryUI Autocomplete can use to fetch autocomplete
             suggestions.
 
+        :param label_lookup:
+            A callable that is given a list of IDs (as strings) and returns a
+            dict mapping those of them which exist to their labels. It lets
+            :py:func:`prefetch_labels` put the labels of many widgets into
+            the rendered markup, so the page doesn't have to request them.
+
+        :param min_term_length:
+            Search terms shorter than this aren't sent to the server.
+
+        :param stop_terms:
+            Search terms which aren't sent to the server either.
+
+        :param bundle_version:
+            A callable returning the version of a bundle of all choices, or
+            ``None``. If there is one, its URL is rendered and the browser
+            searches it instead of asking the server every time.
+
         """
         super().__init__(attrs=attrs)
+        self.queries = queries
         self.token = token_generator(self)
         if registry is None:
             registry = REGISTRY
         registry[self.token] = self
-        self.queries = queries
         self.js_generator = js_initialization_template
         self.js_url_maker = json_url_maker
+        self.label_lookup = label_lookup
+        self.min_term_length = min_term_length
+        self.stop_terms = stop_terms
+        self.bundle_version = bundle_version
+        self.labels = {}
+
+    def __deepcopy__(self, memo):
+        obj = super().__deepcopy__(memo)
+        # labels belong to one form's values
+        obj.labels = {}
+        return obj
+
+    def get_label(self, value):
+        """Get the label for ``value``, or ``None`` if it can't be found.
+
+        Only labels stored by :py:func:`prefetch_labels` are known; rendering
+        doesn't look any up, since that would cost one query per widget. The
+        browser asks for the missing ones, all widgets of a page at once.
+
+        """
+        if value in (None, ''):
+            return None
+        return self.labels.get(str(value))
 
     def render(self, name, value, attrs=None):
         """TODO: docstring"""
@@ -112,8 +184,61 @@ class AutocompleteSelect(django.forms.Widget):
         input_class = attrs.get('class', '') + " simpleselect"
         attrs['class'] = input_class
 
+        label = self.get_label(value)
+        if label is not None:
+            attrs['data-simpleselect-label'] = label
+        if self.min_term_length is not None:
+            attrs['data-simpleselect-min-length'] = self.min_term_length
+        if self.stop_terms:
+            attrs['data-simpleselect-stop-terms'] = ' '.join(
+                term.lower() for term in self.stop_terms)
+
         # TODO: extract id_{}
         url = self.js_url_maker(self)
-        js = self.js_generator(input_id="id_{}".format(name), url=url)
+        attrs['data-simpleselect-url'] = url
+        if self.bundle_version is not None:
+            version = self.bundle_version()
+            if version is not None:
+                attrs['data-simpleselect-bundle'] = '{}&bundle={}'.format(
+                    url, version)
+        html = input.render(name, value, attrs)
+        if self.js_generator is not None:
+            html += mark_safe(self.js_generator(
+                input_id="id_{}".format(name), url=url))
+        return html
 
-        return input.render(name, value, attrs) + mark_safe(js)
+
+def prefetch_labels(forms):
+    """Look up the labels of all autocomplete widgets in some forms at once.
+
+    Without this, widgets are rendered without their labels and the browser
+    requests them once the page has loaded. Call this before rendering to put
+    them into the markup instead, with one query per kind of field, however
+    many forms there are::
+
+        formset = PersonFormSet(queryset=...)
+        simpleselect.widgets.prefetch_labels(formset)
+
+    :type  forms: iterable of Form
+    :param forms: Bound or initialized forms; a formset works too.
+
+    """
+    groups = collections.OrderedDict()
+    for form in forms:
+        for bound_field in form:
+            widget = bound_field.field.widget
+            value = bound_field.value()
+            if (not isinstance(widget, AutocompleteSelect)
+                    or widget.label_lookup is None
+                    or value in (None, '')):
+                continue
+            lookup, entries = groups.setdefault(widget.token,
+                                                (widget.label_lookup, []))
+            entries.append((widget, str(value)))
+
+    for lookup, entries in groups.values():
+        found = lookup(list(collections.OrderedDict.fromkeys(
+            value for _, value in entries)))
+        for widget, value in entries:
+            if value in found:
+                widget.labels[value] = found[value]
@@ -0,0 +1,162 @@
+"""A WSGI application answering autocomplete requests on a short path.
+
+Requests to the ``simpleselect.urls`` view go through all of the project's
+middleware (sessions, CSRF, messages...) and URL resolving, which for a small
+search takes longer than the search itself. :py:class:`AutocompleteApplication`
+calls :py:func:`simpleselect.views.autocomplete_filter` directly, with only
+the middleware listed in the ``SIMPLESELECT_MIDDLEWARE`` setting (none by
+default). :py:func:`mount` puts it in front of the project's application in
+its WSGI module::
+
+    from django.core.wsgi import get_wsgi_application
+    import simpleselect.wsgi
+
+    application = simpleselect.wsgi.mount(get_wsgi_application())
+
+"""
+import importlib
+import logging
+import sys
+
+import django.conf
+import django.core.handlers.wsgi
+import django.core.signals
+import django.http
+
+from . import fields
+from . import views
+
+logger = logging.getLogger('django.request')
+
+#: Where the view is when ``simpleselect.urls`` is included at the root.
+DEFAULT_PATH = '/simpleselectquery/'
+
+
+def load_middleware(paths):
+    """Create instances of the middleware classes at the given dotted
+    paths."""
+    middleware = []
+    for path in paths:
+        module_name, _, attr = path.rpartition('.')
+        cls = getattr(importlib.import_module(module_name), attr)
+        middleware.append(cls())
+    return middleware
+
+
+def get_status(response):
+    """Get the WSGI status line of a response, e.g. ``'200 OK'``."""
+    reason = getattr(response, 'reason_phrase', None)
+    if reason is None:  # Django < 1.6
+        reason = django.core.handlers.wsgi.STATUS_CODE_TEXT.get(
+            response.status_code, 'UNKNOWN')
+    return '{} {}'.format(response.status_code, reason)
+
+
+class AutocompleteApplication(object):
+    """A WSGI application running only the autocomplete view."""
+
+    def __init__(self, middleware=None, view=views.autocomplete_filter,
+                 modules=None):
+        """Create the application.
+
+        Requests to it never load the project's URLconf, so the modules
+        defining fields are imported here; otherwise a new worker wouldn't
+        know any field until its first normal request.
+
+        :type  middleware: seq of str or None
+        :param middleware: Dotted paths of the middleware classes to apply,
+                           in the order of ``MIDDLEWARE_CLASSES``. Defaults to
+                           the ``SIMPLESELECT_MIDDLEWARE`` setting, e.g.
+                           ``['django.contrib.sessions.middleware.'
+                           'SessionMiddleware', 'django.contrib.auth.'
+                           'middleware.AuthenticationMiddleware']`` if fields
+                           need ``request.user``.
+
+        :type  view: callable
+        :param view: The view answering every request.
+
+        :type  modules: seq of str or None
+        :param modules: Dotted names of the modules defining fields, passed
+                        to :py:func:`simpleselect.fields.autodiscover`.
+                        Defaults to the ``SIMPLESELECT_FIELD_MODULES``
+                        setting, and without that, to the ``forms`` module
+                        of every installed app.
+
+        """
+        if middleware is None:
+            middleware = getattr(django.conf.settings,
+                                 'SIMPLESELECT_MIDDLEWARE', ())
+        if modules is None:
+            modules = getattr(django.conf.settings,
+                              'SIMPLESELECT_FIELD_MODULES', ())
+        fields.autodiscover(modules)
+        self.middleware = load_middleware(middleware)
+        self.view = view
+
+    def get_response(self, request):
+        """Run the middleware and the view like Django's handler does.
+
+        Every middleware's ``process_response`` is applied, even when a
+        ``process_request`` returned a response early.
+
+        """
+        response = None
+        try:
+            for middleware in self.middleware:
+                if hasattr(middleware, 'process_request'):
+                    response = middleware.process_request(request)
+                    if response is not None:
+                        break
+            if response is None:
+                response = self.view(request)
+        except django.http.Http404:
+            response = django.http.HttpResponseNotFound()
+        except Exception:
+            if django.conf.settings.DEBUG_PROPAGATE_EXCEPTIONS:
+                raise
+            logger.error('Internal Server Error: %s', request.path,
+                         exc_info=sys.exc_info(),
+                         extra={'status_code': 500, 'request': request})
+            response = django.http.HttpResponseServerError()
+
+        for middleware in reversed(self.middleware):
+            if hasattr(middleware, 'process_response'):
+                response = middleware.process_response(request, response)
+        return response
+
+    def __call__(self, environ, start_response):
+        django.core.signals.request_started.send(sender=self.__class__)
+        request = django.core.handlers.wsgi.WSGIRequest(environ)
+        response = self.get_response(request)
+
+        status = get_status(response)
+        headers = [(str(name), str(value)) for name, value in response.items()]
+        for cookie in response.cookies.values():
+            headers.append(('Set-Cookie', str(cookie.output(header=''))))
+        start_response(status, headers)
+        # the server closes the response, which sends request_finished
+        return response
+
+
+def mount(application, path=DEFAULT_PATH, autocomplete=None):
+    """Send the requests for one path to an :py:class:`AutocompleteApplication`
+    and all others to ``application``.
+
+    :type  path: str
+    :param path: Where the widgets send their requests, i.e. the URL of the
+                 ``simpleselect`` view in the project's URLconf.
+
+    :type  autocomplete: callable or None
+    :param autocomplete: The WSGI application for ``path``. Defaults to an
+                         :py:class:`AutocompleteApplication` with the
+                         ``SIMPLESELECT_MIDDLEWARE`` setting.
+
+    """
+    if autocomplete is None:
+        autocomplete = AutocompleteApplication()
+
+    def dispatch(environ, start_response):
+        if environ.get('PATH_INFO') == path:
+            return autocomplete(environ, start_response)
+        return application(environ, start_response)
+    return dispatch
@@ -10,6 +10,8 @@ class PersonField(simpleselect.AutoSelectField):
 
     data = models.Person.objects.all()
 
+    label_format = '{first_name} {last_name} ({company__name})'
+
 
 class AddEmployeeForm(forms.Form):
     """Really just a farce that lets me play with a different field."""
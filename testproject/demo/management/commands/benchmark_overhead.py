@@ -0,0 +1,52 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.test.client import RequestFactory
+
+import simpleselect.wsgi
+
+from demo import forms
+
+
+def call(application, environ):
+    """Make one request to a WSGI application and read the whole response."""
+    response = application(dict(environ), lambda status, headers: None)
+    try:
+        return b''.join(response)
+    finally:
+        response.close()
+
+
+class Command(BaseCommand):
+    help = ("Time the same search through the project's WSGI application, "
+            "with all of its middleware, and through "
+            "simpleselect.wsgi.AutocompleteApplication.")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--requests', type='int', default=1000,
+                    help='Requests to time per application.'),
+        make_option('--term', default='jo', help='The search term.'),
+    )
+
+    def handle(self, **options):
+        factory = RequestFactory(SERVER_NAME='localhost')
+        environ = factory.get(simpleselect.wsgi.DEFAULT_PATH, {
+            'field': forms.PersonField.registry_key_func(),
+            'term': options['term'],
+        }).environ
+        applications = [
+            ('project', get_wsgi_application()),
+            ('fast path', simpleselect.wsgi.AutocompleteApplication()),
+        ]
+
+        count = options['requests']
+        for name, application in applications:
+            call(application, environ)  # warm up
+            start = time.time()
+            for _ in range(count):
+                call(application, environ)
+            elapsed = time.time() - start
+            self.stdout.write('{:<10} {:>10.1f} us/request\n'.format(
+                name, elapsed / count * 1e6))
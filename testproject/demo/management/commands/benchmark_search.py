@@ -0,0 +1,242 @@
+import datetime
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from optparse import make_option
+
+import django
+import django.db
+from django.core.management.base import BaseCommand
+from django.test.client import RequestFactory
+
+import simpleselect
+from simpleselect import index
+from simpleselect import postgres
+from simpleselect import stats
+from simpleselect import views
+
+from demo import models
+
+SYLLABLES = ['an', 'bel', 'cor', 'dan', 'el', 'fi', 'gor', 'han', 'is', 'jo',
+             'ka', 'lu', 'mar', 'ne', 'ol', 'pe', 'ri', 'sa', 'tom', 'vi']
+
+COMPANY_SUFFIXES = ['Inc', 'Ltd', 'Group', 'Works', 'Partners']
+
+#: The ``queries`` of the benchmarked fields, by how many lookups they have.
+QUERIES = {
+    1: ['first_name__icontains'],
+    2: ['first_name__icontains', 'last_name__icontains'],
+    3: ['first_name__icontains', 'last_name__icontains',
+        'company__name__icontains'],
+}
+
+#: Ways of searching, as extra attributes of the benchmarked fields.
+BACKENDS = {
+    'default': lambda: {},
+    'rank': lambda: {'rank_results': True},
+    'compiled': lambda: {'compile_search': True},
+    'prefix': lambda: {'search_backend': index.PrefixIndex()},
+    'trigram': lambda: {'search_backend': index.TrigramIndex()},
+    'pg_trigram': lambda: {'search_backend': postgres.TrigramSearch()},
+    'pg_fulltext': lambda: {'search_backend': postgres.FullTextSearch()},
+}
+
+
+def make_name(rng, syllables):
+    return ''.join(rng.choice(SYLLABLES)
+                   for _ in range(syllables)).capitalize()
+
+
+def delete_all(model, using):
+    """Empty a table without loading its rows, which deleting through a
+    QuerySet would do because of simpleselect's signal receivers."""
+    connection = django.db.connections[using]
+    cursor = connection.cursor()
+    cursor.execute('DELETE FROM {}'.format(
+        connection.ops.quote_name(model._meta.db_table)))
+
+
+def seed(size, using, batch_size=10000, insert_size=500):
+    """Fill the demo tables with ``size`` people, unless they already have
+    that many. The same size always gives the same data.
+
+    People are made ``batch_size`` at a time and inserted ``insert_size`` per
+    query; SQLite refuses much larger ``INSERT`` statements.
+
+    """
+    if models.Person.objects.using(using).count() == size:
+        return False
+    delete_all(models.Person, using)
+    delete_all(models.Company, using)
+
+    rng = random.Random(size)
+    models.Company.objects.using(using).bulk_create(
+        [models.Company(name='{} {}'.format(make_name(rng, 2),
+                                            rng.choice(COMPANY_SUFFIXES)))
+         for _ in range(max(size // 100, 1))], insert_size)
+    company_ids = list(models.Company.objects.using(using)
+                       .values_list('pk', flat=True))
+    for start in range(0, size, batch_size):
+        models.Person.objects.using(using).bulk_create(
+            [models.Person(first_name=make_name(rng, 2),
+                           last_name=make_name(rng, 3),
+                           company_id=rng.choice(company_ids))
+             for _ in range(min(batch_size, size - start))], insert_size)
+    return True
+
+
+def make_field(backend, query_count, limit, using):
+    """Make an AutoSelectField subclass for one benchmark configuration."""
+    attrs = {
+        'queries': QUERIES[query_count],
+        'data': models.Person.objects.using(using).all(),
+        'label_format': '{first_name} {last_name}',
+        'max_results': limit,
+        '__module__': __name__,
+    }
+    attrs.update(BACKENDS[backend]())
+    name = 'Bench_{}_{}_{}'.format(backend, query_count, limit)
+    return type(name, (simpleselect.AutoSelectField,), attrs)
+
+
+def make_terms(rng, people, count):
+    """Pick ``count`` search terms which find at least one person: the
+    starts of a random person's name parts."""
+    first_name, last_name = rng.choice(people)
+    parts = itertools.cycle([first_name, last_name])
+    return [next(parts)[:rng.randint(2, 4)].lower() for _ in range(count)]
+
+
+def percentile(values, fraction):
+    """Get a percentile of ``values`` by the nearest-rank method.
+
+    >>> percentile([4, 1, 3, 2], 0.5)
+    2
+
+    """
+    ordered = sorted(values)
+    return ordered[max(int(math.ceil(fraction * len(ordered))) - 1, 0)]
+
+
+def measure(view, field, requests):
+    """Time a view on a list of requests, after one untimed warm-up.
+
+    :returns: The durations in milliseconds and the number of queries.
+
+    """
+    view(field, requests[0])
+    durations, queries = [], 0
+    for request in requests:
+        with stats.QueryCounter() as counter:
+            start = time.perf_counter()
+            view(field, request)
+            durations.append((time.perf_counter() - start) * 1000)
+        queries += counter.count
+    return durations, queries
+
+
+def split_ints(value):
+    return [int(part) for part in value.split(',')]
+
+
+class Command(BaseCommand):
+    help = ("Benchmark searches and ID lookups on the demo Person model, "
+            "printing one JSON object per configuration.\n\n"
+            "The demo tables are emptied and filled with generated people "
+            "for every size, so use a database made for it.")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--sizes', type='string', default='10000',
+                    help='Comma-separated numbers of people, e.g. '
+                         '10000,100000,1000000.'),
+        make_option('--backends', type='string', default='default,rank',
+                    help='Comma-separated search backends out of: {}.'
+                         .format(', '.join(sorted(BACKENDS)))),
+        make_option('--terms', type='string', default='1,2,3',
+                    help='Comma-separated numbers of search terms.'),
+        make_option('--queries', type='string', default='2',
+                    help='Comma-separated numbers of field lookups (1-3).'),
+        make_option('--limits', type='string', default='20',
+                    help='Comma-separated max_results values.'),
+        make_option('--ids', type='string', default='1,10',
+                    help='Comma-separated numbers of IDs per lookup.'),
+        make_option('--requests', type='int', default=100,
+                    help='Timed requests per configuration.'),
+        make_option('--database', type='string', default='default',
+                    help='The database alias to use.'),
+        make_option('--output', type='string', default=None,
+                    help='Append the results to this file instead of '
+                         'printing them.'),
+    )
+
+    def handle(self, **options):
+        using = options['database']
+        rng = random.Random(0)
+        factory = RequestFactory()
+        output = (open(options['output'], 'a') if options['output']
+                  else sys.stdout)
+        common = {
+            'database': django.db.connections[using].vendor,
+            'django': django.get_version(),
+            'date': datetime.datetime.utcnow().isoformat(),
+        }
+
+        def write(result):
+            result.update(common)
+            output.write(json.dumps(result, sort_keys=True) + '\n')
+            output.flush()
+
+        try:
+            for size in split_ints(options['sizes']):
+                if seed(size, using):
+                    self.stderr.write('Seeded {} people.\n'.format(size))
+                people = list(models.Person.objects.using(using)
+                              .values_list('first_name', 'last_name'))
+                pks = list(models.Person.objects.using(using)
+                           .values_list('pk', flat=True))
+
+                configurations = itertools.product(
+                    options['backends'].split(','),
+                    split_ints(options['queries']),
+                    split_ints(options['limits']))
+                for backend, query_count, limit in configurations:
+                    field = make_field(backend, query_count, limit, using)
+                    for term_count in split_ints(options['terms']):
+                        requests = [
+                            factory.get('/', {'term': ' '.join(
+                                make_terms(rng, people, term_count))})
+                            for _ in range(options['requests'])]
+                        durations, queries = measure(views.do_search, field,
+                                                     requests)
+                        write(self.summarize(
+                            durations, queries, benchmark='search',
+                            rows=size, backend=backend,
+                            field_queries=query_count, limit=limit,
+                            terms=term_count))
+
+                field = make_field('default', 2, 20, using)
+                for id_count in split_ints(options['ids']):
+                    requests = [factory.get('/', {'id': rng.sample(
+                                    pks, min(id_count, len(pks)))})
+                                for _ in range(options['requests'])]
+                    durations, queries = measure(views.get_item_detail,
+                                                 field, requests)
+                    write(self.summarize(durations, queries,
+                                         benchmark='lookup', rows=size,
+                                         ids=id_count))
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+    def summarize(self, durations, queries, **result):
+        result.update({
+            'requests': len(durations),
+            'p50_ms': round(percentile(durations, 0.5), 3),
+            'p99_ms': round(percentile(durations, 0.99), 3),
+            'mean_ms': round(sum(durations) / len(durations), 3),
+            'queries_per_request': queries / len(durations),
+        })
+        return result